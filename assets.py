@@ -0,0 +1,45 @@
+'''
+    Process-wide registry of assets (images and everything rendered from them).
+    Each asset is created on first request and shared by every sprite afterwards,
+    so drones created by every simulation never read files again.
+    Images are converted to the display format, assets must be requested after pg.display.set_mode.
+'''
+import pygame as pg
+
+_assets = {}
+
+
+def get(key, factory):
+    '''
+        Asset registered as key, created by calling factory the first time it is requested
+
+        key: hashable identifying the asset
+        factory: function without arguments returning the asset
+    '''
+    asset = _assets.get(key)
+    if asset is None:
+        asset = _assets[key] = factory()
+    return asset
+
+
+def load_image(path, alpha=True):
+    '''
+        Image read from path, converted once to the display format
+
+        alpha: keeps the per-pixel alpha of the file
+        return: Surface shared by every caller, copy it before drawing on it
+    '''
+    def load():
+        image = pg.image.load(path)
+        return image.convert_alpha() if alpha else image.convert()
+    return get(('image', path, alpha), load)
+
+
+def load_images(paths, alpha=True):
+    '''List of the images in paths, see load_image'''
+    return [load_image(path, alpha) for path in paths]
+
+
+def clear():
+    '''Forgets every asset, needed only if the display format changes'''
+    _assets.clear()
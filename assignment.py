@@ -0,0 +1,178 @@
+import numpy as np
+from collections import namedtuple
+
+from constants import RADIUS_OBSTACLES
+from grid import OBSTACLE
+
+# Rectangle of cells [col0, col1) x [row0, row1) of the grid assigned to one drone
+# weight: number of free cells inside it, start: (col, row) of the cell the drone starts searching
+GridRegion = namedtuple('GridRegion', ['col0', 'col1', 'row0', 'row1', 'weight', 'start'])
+
+
+def free_cell_weights(grid, obstacles=()):
+    '''
+        Weight of every cell of the grid to be searched: 1 for free cells,
+        0 for cells marked as OBSTACLE or whose center is inside an obstacle
+
+        grid: GridField
+        obstacles: positions of the obstacles
+        return: array (rows, cols)
+    '''
+    weights = (grid.states[:grid.rows, :grid.cols] != OBSTACLE).astype(float)
+    for o in obstacles:
+        # cells around the obstacle
+        c0 = max(int((o[0] - RADIUS_OBSTACLES) // grid.resolution), 0)
+        c1 = min(int((o[0] + RADIUS_OBSTACLES) // grid.resolution) + 1, grid.cols)
+        r0 = max(int((o[1] - RADIUS_OBSTACLES) // grid.resolution), 0)
+        r1 = min(int((o[1] + RADIUS_OBSTACLES) // grid.resolution) + 1, grid.rows)
+        if c0 >= c1 or r0 >= r1:
+            continue
+        dx = (np.arange(c0, c1) + 0.5) * grid.resolution - o[0]
+        dy = (np.arange(r0, r1) + 0.5) * grid.resolution - o[1]
+        inside = dx[None, :] ** 2 + dy[:, None] ** 2 <= RADIUS_OBSTACLES ** 2
+        weights[r0:r1, c0:c1][inside] = 0
+    return weights
+
+
+def split_regions(weights, num_regions):
+    '''
+        Splits the grid in num_regions rectangles with about the same weight,
+        cutting recursively the longest side of every rectangle
+
+        weights: array (rows, cols) with the weight of every cell
+        num_regions: number of regions
+        return: list of GridRegion
+    '''
+    rows, cols = weights.shape
+    regions = []
+    _bisect(weights, 0, cols, 0, rows, num_regions, regions)
+    return regions
+
+
+def _bisect(weights, col0, col1, row0, row1, num_regions, regions):
+    if num_regions <= 0:
+        return
+    block = weights[row0:row1, col0:col1]
+    if num_regions == 1 or block.size == 1:
+        # a single cell can not be split, every remaining drone searches it
+        region = GridRegion(col0, col1, row0, row1, float(block.sum()), _start_cell(block, col0, row0))
+        regions.extend([region] * num_regions)
+        return
+
+    first = num_regions // 2
+    split_cols = col1 - col0 >= row1 - row0
+    # weight of every line along the axis that is cut
+    profile = block.sum(axis=0) if split_cols else block.sum(axis=1)
+    total = profile.sum()
+    if total > 0:
+        cut = int(np.searchsorted(np.cumsum(profile), total * first / num_regions)) + 1
+    else:
+        cut = len(profile) * first // num_regions
+    cut = min(max(cut, 1), len(profile) - 1)
+
+    if split_cols:
+        _bisect(weights, col0, col0 + cut, row0, row1, first, regions)
+        _bisect(weights, col0 + cut, col1, row0, row1, num_regions - first, regions)
+    else:
+        _bisect(weights, col0, col1, row0, row0 + cut, first, regions)
+        _bisect(weights, col0, col1, row0 + cut, row1, num_regions - first, regions)
+
+
+def _start_cell(block, col0, row0):
+    '''
+        Free cell of the block closest to its weighted centroid, the center of the block if it has no free cell
+    '''
+    rows, cols = np.nonzero(block > 0)
+    if len(rows) == 0:
+        return (col0 + block.shape[1] // 2, row0 + block.shape[0] // 2)
+    w = block[rows, cols]
+    center_col = np.average(cols, weights=w)
+    center_row = np.average(rows, weights=w)
+    closest = int(np.argmin((cols - center_col) ** 2 + (rows - center_row) ** 2))
+    return (col0 + int(cols[closest]), row0 + int(rows[closest]))
+
+
+def auction_assignment(cost, epsilon_factor=5, tolerance=1e-6):
+    '''
+        Minimum cost assignment of rows (drones) to columns (regions) with the Jacobi auction algorithm
+        and epsilon scaling: every unassigned row bids at once for its best column, the price of every
+        column is raised by the highest bid, and the bid increment epsilon is reduced between rounds.
+        The total cost is within num_rows * epsilon of the optimum, epsilon ends at tolerance * range of the costs.
+
+        cost: array (N, M) with N <= M
+        epsilon_factor: epsilon is divided by it between rounds
+        tolerance: final epsilon relative to the range of the costs
+        return: array (N,) with the column assigned to every row
+    '''
+    benefit = -np.asarray(cost, dtype=float)
+    num_rows, num_cols = benefit.shape
+    if num_rows > num_cols:
+        raise ValueError(f'auction_assignment needs at least as many columns as rows, got {benefit.shape}')
+    if num_rows == 0:
+        return np.zeros(0, dtype=np.intp)
+    if num_rows < num_cols:
+        # dummy rows with the same benefit for every column take the columns left over,
+        # otherwise columns priced in a previous round and left free would break the optimality
+        padded = np.zeros((num_cols, num_cols))
+        padded[:num_rows] = benefit - benefit.min()
+        return auction_assignment(-padded, epsilon_factor, tolerance)[:num_rows]
+
+    spread = float(benefit.max() - benefit.min()) or 1.0
+    epsilon = spread / 4
+    final_epsilon = spread * tolerance / num_rows
+    prices = np.zeros(num_cols)
+
+    while True:
+        assigned = np.full(num_rows, -1, dtype=np.intp) # column of every row
+        owner = np.full(num_cols, -1, dtype=np.intp) # row of every column
+        while True:
+            bidders = np.flatnonzero(assigned < 0)
+            if len(bidders) == 0:
+                break
+            values = benefit[bidders] - prices
+            if num_cols > 1:
+                two_best = np.argpartition(-values, 1, axis=1)[:, :2]
+                best_values = values[np.arange(len(bidders))[:, None], two_best]
+                order = np.argsort(-best_values, axis=1)
+                best = two_best[np.arange(len(bidders)), order[:, 0]]
+                increment = best_values.max(axis=1) - best_values.min(axis=1) + epsilon
+            else:
+                best = np.zeros(len(bidders), dtype=np.intp)
+                increment = np.full(len(bidders), spread + epsilon)
+            bids = prices[best] + increment
+
+            # highest bid for every column wins it
+            by_column = np.lexsort((-bids, best))
+            first = np.ones(len(by_column), dtype=bool)
+            first[1:] = best[by_column[1:]] != best[by_column[:-1]]
+            winners = by_column[first]
+            columns = best[winners]
+
+            previous = owner[columns]
+            assigned[previous[previous >= 0]] = -1
+            owner[columns] = bidders[winners]
+            assigned[bidders[winners]] = columns
+            prices[columns] = bids[winners]
+
+        if epsilon <= final_epsilon:
+            return assigned
+        epsilon = max(epsilon / epsilon_factor, final_epsilon)
+
+
+def assign_drones_to_regions(grid, positions, obstacles=()):
+    '''
+        Splits the grid in one balanced region per drone and assigns the regions
+        minimizing the total distance from the drones to the start cell of their region
+
+        grid: GridField
+        positions: array (N,2) of positions of the drones
+        obstacles: positions of the obstacles, their cells are not counted in the balance
+        return: list with the GridRegion of every drone
+    '''
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    regions = split_regions(free_cell_weights(grid, obstacles), len(positions))
+    if not regions:
+        return []
+    starts = grid.get_cell_centers([r.start[0] for r in regions], [r.start[1] for r in regions])
+    cost = np.linalg.norm(positions[:, None, :] - starts[None, :, :], axis=2)
+    return [regions[j] for j in auction_assignment(cost)]
@@ -11,17 +11,40 @@ M2PIX = 100.0  # factor to convert from meters to pixels
 
 NUM_DRONES = 10 # Number of simultaneous drones
 SIZE_DRONE = 18
+SPRITE_ROTATION_STEPS = 72 # angles the drone sprites are pre-rendered at (72 steps of 5 degrees)
 
-SIZE_TRACK = 1
 RESOLUTION = 50 # Of grid
+SENSOR_RADIUS = 0 # radius in pixels of the area each drone marks as visited, 0 marks only the cell under the drone
 NUM_OBSTACLES = 30
 RADIUS_OBSTACLES = 40
 TIME_MAX_SIMULATION = 60 # Time to stop simulation in case the conditions are not completed
+COVERAGE_SAMPLE_TIME = 1.0 # simulated seconds between samples of the coverage curve
 AVOID_OBSTACLES = RADIUS_OBSTACLES *1.6
+OBSTACLE_REPULSION = 0.005 # strength of the repulsion of obstacles
+USE_REPULSION_FIELD = False # obstacle repulsion from a precomputed raster instead of evaluating it every step
+REPULSION_FIELD_RESOLUTION = 4 # distance in pixels between nodes of the repulsion raster
+PATH_OBSTACLE_INFLATION = SIZE_DRONE # distance the path planner keeps from the border of obstacles
+PATH_CACHE_SIZE = 256 # paths kept by the path planner
 
 # Sample Time Parameters
 FREQUENCY = 60.0  # simulation frequency
 SAMPLE_TIME = 1.0 / FREQUENCY  # simulation sample time
+SIZE_TRACK = int(TIME_MAX_SIMULATION * FREQUENCY) # positions kept per drone in the track ring buffer (a whole mission)
+FAST_MODE = False # Run as fast as possible instead of FREQUENCY steps per second (key F toggles it)
+TIME_WARP = 1.0 # simulated seconds per real second, steps run per rendered frame follow from it
+TIME_WARP_LEVELS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 12.0, 16.0, 32.0) # time warp steps of keys +/-
+MAX_FRAME_TIME = 0.25 # real seconds simulated at most per frame, the simulation slows down only past it
+DIRTY_RECT_RENDERING = True # Redraw and push to the display only the areas of the screen that changed
+DIRTY_RECT_MAX_AREA = 0.5 # fraction of the screen changed above which the whole frame is redrawn
+TEXT_CACHE_SIZE = 1024 # rendered texts kept by the text cache
+LEGEND_MIN_ZOOM = 0.6 # drone legends are not drawn when zoomed out below this level
+SCREEN_RENDERER = False # Draw straight on the screen instead of on a world-sized surface (key V toggles it)
+GRID_LINE_MIN_PIXELS = 4 # grid lines are not drawn by the screen renderer when cells are smaller on screen
+TRAILS = True # flight path of the drones accumulated on a persistent layer below them
+TRAIL_FADE_ALPHA = 255 # alpha kept out of 255 by each fade pass of the trail layer, 255 never fades
+TRAIL_FADE_INTERVAL = 60 # frames between fade passes, each one redraws the whole static layer
+TRAIL_SCREEN_LENGTH = 300 # last positions of every track drawn by the screen renderer, which redraws them every frame
+VIEW_CULL_MARGIN = 150 # entities within this distance in pixels of the visible area are still drawn (sprites, legends)
 
 # Behavior Parameters
 FORWARD_SPEED = 2  # default linear speed when going forward
@@ -31,6 +54,7 @@ RADIUS_TARGET = 130
 MASS = 10 # Drone Mass, used to calculate force
 HOP_AHEAD = 60 # distance of prevision
 AVOID_DISTANCE = 30 # distance to avoid collision
+NEIGHBOR_INDEX = 'spatial_hash' # neighbor search between drones: 'spatial_hash' or 'quadtree'
 
 # Colors
 BLACK = (0,0,0)
@@ -1,5 +1,10 @@
+import math
+import numpy as np
 import pygame
-from constants import SCREEN_WIDTH, SCREEN_HEIGHT, WORLD_WIDTH, WORLD_HEIGHT
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT, WORLD_WIDTH, WORLD_HEIGHT, SCREEN_RENDERER
+from text_cache import TextCache
+
+BACKGROUND_COLOR = (50, 50, 50) # screen area outside the world
 
 class DisplayManager(object):
     '''
@@ -10,6 +15,7 @@ class DisplayManager(object):
         self.font16 = pygame.font.SysFont(None, 16)
         self.font20 = pygame.font.SysFont(None, 20)
         self.font24 = pygame.font.SysFont(None, 24)
+        self.text_cache = TextCache()
         self.size = SCREEN_WIDTH, SCREEN_HEIGHT 
         self.clock = pygame.time.Clock()
         self.screen = pygame.display.set_mode(self.size)
@@ -21,8 +27,28 @@ class DisplayManager(object):
         self.min_zoom = min(SCREEN_WIDTH / WORLD_WIDTH, SCREEN_HEIGHT / WORLD_HEIGHT)
         self.max_zoom = 5.0
         
-        # World surface to draw everything on before scaling
-        self.world_surface = pygame.Surface((WORLD_WIDTH, WORLD_HEIGHT))
+        # World surface to draw everything on before scaling, created on first use
+        # so the screen renderer never allocates it
+        self._world_surface = None
+        # True when the simulation is drawn straight on the screen, see ScreenRenderer
+        self.screen_space = SCREEN_RENDERER
+        self.screen_rect = self.screen.get_rect()
+        # zoom and offset of the last frame drawn by draw_world_rects, partial frames are only valid for the same view
+        self.presented_view = None
+        # pixels of the world sampled by the screen for a view, see _view_indices
+        self._indices_view = None
+        self._indices = {}
+
+    @property
+    def world_surface(self):
+        if self._world_surface is None:
+            # same pixel format as the screen, pixels are copied between them
+            self._world_surface = pygame.Surface((WORLD_WIDTH, WORLD_HEIGHT)).convert()
+        return self._world_surface
+
+    def render_text(self, font, text, color, antialias=True):
+        """Text rendered with font, from the text cache when it was rendered before."""
+        return self.text_cache.render(font, text, antialias, color)
 
     def handle_zoom(self, event):
         if event.type == pygame.MOUSEWHEEL:
@@ -65,3 +91,123 @@ class DisplayManager(object):
 
     def world_to_screen(self, world_pos):
         return world_pos * self.zoom_level + self.offset
+
+    def view_changed(self):
+        """True when zoom or pan changed since the last full frame was drawn."""
+        return self.presented_view != (self.zoom_level, self.offset.x, self.offset.y)
+
+    def visible_world_rect(self):
+        """Rect of the world visible on the screen."""
+        x0, y0 = self.screen_to_world(pygame.math.Vector2(0, 0))
+        x1, y1 = self.screen_to_world(pygame.math.Vector2(SCREEN_WIDTH, SCREEN_HEIGHT))
+        x0, y0 = math.floor(x0), math.floor(y0)
+        rect = pygame.Rect(x0, y0, math.ceil(x1) - x0, math.ceil(y1) - y0)
+        return rect.clip(pygame.Rect(0, 0, WORLD_WIDTH, WORLD_HEIGHT))
+
+    def scale_length(self, length):
+        """Length on the screen of a length of the world."""
+        return length * self.zoom_level
+
+    def world_rect_to_screen(self, rect):
+        """Smallest rect of the screen covering a rect of the world, clipped to the screen."""
+        x0 = math.floor(rect.left * self.zoom_level + self.offset.x)
+        y0 = math.floor(rect.top * self.zoom_level + self.offset.y)
+        x1 = math.ceil(rect.right * self.zoom_level + self.offset.x)
+        y1 = math.ceil(rect.bottom * self.zoom_level + self.offset.y)
+        return pygame.Rect(x0, y0, x1 - x0, y1 - y0).clip(self.screen_rect)
+
+    def draw_world(self, world_surface):
+        """Scales the visible part of the world surface to the whole screen."""
+        zoom = self.zoom_level
+        offset = self.offset
+        self.screen.fill(BACKGROUND_COLOR) # Clear screen
+
+        # If zoomed in enough that world covers screen (or mostly)
+        # We crop the visible area and scale ONLY that.
+        # This prevents creating massive surfaces (e.g. 20k x 10k pixels) when zooming in.
+        if zoom > 1.0:
+            # Calculate visible world area
+            # world_x = (screen_x - offset_x) / zoom
+            wx = -offset.x / zoom
+            wy = -offset.y / zoom
+            ww = SCREEN_WIDTH / zoom
+            wh = SCREEN_HEIGHT / zoom
+            
+            # Clamp to world bounds to avoid errors
+            wx = max(0, wx)
+            wy = max(0, wy)
+            ww = min(ww, WORLD_WIDTH - wx)
+            wh = min(wh, WORLD_HEIGHT - wy)
+            
+            if ww > 0 and wh > 0:
+                try:
+                    subsurf = world_surface.subsurface(pygame.Rect(wx, wy, ww, wh))
+                    scaled_surf = pygame.transform.scale(subsurf, (int(ww * zoom), int(wh * zoom)))
+                    self.screen.blit(scaled_surf, (0, 0))
+                except Exception as e:
+                    # Fallback if subsurface fails (e.g. out of bounds due to float precision)
+                    print(f"Render error: {e}")
+                    pass
+        else:
+            # Zoomed out or normal: scale the whole world (it's small enough)
+            scaled_surface = pygame.transform.scale(
+                world_surface, 
+                (int(WORLD_WIDTH * zoom), 
+                 int(WORLD_HEIGHT * zoom))
+            )
+            self.screen.blit(scaled_surface, offset)
+
+    def _view_indices(self, scale=1.0, size=(WORLD_WIDTH, WORLD_HEIGHT)):
+        """
+            Column and row of the source sampled by every column and row of the screen, -1 outside the source.
+            scale: size of the source relative to the world (1 / 2**level for mipmaps of the world)
+            size: size of the source
+        """
+        view = (self.zoom_level, self.offset.x, self.offset.y)
+        if self._indices_view != view:
+            self._indices_view = view
+            self._indices = {}
+        key = (scale, size)
+        if key not in self._indices:
+            xs = np.floor((np.arange(SCREEN_WIDTH) + 0.5 - self.offset.x) / self.zoom_level * scale).astype(np.intp)
+            ys = np.floor((np.arange(SCREEN_HEIGHT) + 0.5 - self.offset.y) / self.zoom_level * scale).astype(np.intp)
+            xs[(xs < 0) | (xs >= size[0])] = -1
+            ys[(ys < 0) | (ys >= size[1])] = -1
+            self._indices[key] = (xs, ys)
+        return self._indices[key]
+
+    def draw_world_rects(self, world_surface, screen_rects, scale=1.0):
+        """
+            Redraws only some rects of the screen from the world surface, sampling the nearest pixel of the world.
+            Every screen pixel is always sampled from the same world pixel for a given view, so rects redrawn
+            in different frames match each other.
+
+            world_surface: the world or a downsampled copy of it
+            screen_rects: list of rects of the screen
+            scale: size of world_surface relative to the world
+        """
+        self.presented_view = (self.zoom_level, self.offset.x, self.offset.y)
+        xs, ys = self._view_indices(scale, world_surface.get_size())
+        world = pygame.surfarray.pixels2d(world_surface)
+        screen = pygame.surfarray.pixels2d(self.screen)
+        background = self.screen.map_rgb(BACKGROUND_COLOR)
+        for rect in screen_rects:
+            rect = rect.clip(self.screen_rect)
+            if rect.width <= 0 or rect.height <= 0:
+                continue
+            cols = xs[rect.left:rect.right]
+            rows = ys[rect.top:rect.bottom]
+            # the world is a rectangle on the screen, columns and rows inside it are contiguous
+            inside_cols = np.flatnonzero(cols >= 0)
+            inside_rows = np.flatnonzero(rows >= 0)
+            area = screen[rect.left:rect.right, rect.top:rect.bottom]
+            if len(inside_cols) < len(cols) or len(inside_rows) < len(rows):
+                area[...] = background
+            if len(inside_cols) == 0 or len(inside_rows) == 0:
+                continue
+            c0, c1 = inside_cols[0], inside_cols[-1] + 1
+            r0, r1 = inside_rows[0], inside_rows[-1] + 1
+            # arrays are indexed [x, y] over rows of pixels in memory, whole rows are gathered first
+            area[c0:c1, r0:r1] = world.T.take(rows[r0:r1], axis=0).take(cols[c0:c1], axis=1).T
+        # surfaces stay locked while the arrays exist
+        del world, screen
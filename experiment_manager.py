@@ -27,14 +27,20 @@ class ExperimentManager(object):
         self.out_time_mission = []
         self.out_time_target = []
         self.out_num_uav = []
+        self.out_coverage_curve = [] # coverage of the grid over simulated time: list of (time, coverage)
         self.print_plan_rate()
 
     def set_time_target(self, time_target):
         self.out_time_target.append(time_target)
 
-    def set_out(self, out_time_mission, out_num_uav):
+    def set_out(self, out_time_mission, out_num_uav, out_coverage_curve=None):
         self.out_time_mission.append(out_time_mission)
         self.out_num_uav.append(out_num_uav)
+        self.out_coverage_curve.append(list(out_coverage_curve or []))
+
+    def get_final_coverage(self, idx):
+        curve = self.out_coverage_curve[idx]
+        return curve[-1][1] if curve else 0.0
 
     def next_simulation(self):
         if self.in_repetitions - 1 == self.current_repetition:
@@ -82,14 +88,40 @@ class ExperimentManager(object):
         plt.show()
         #plt.plot(t, t, 'r--', t, t**2, 'bs', t, t**3, 'g^') 
 
+    def plot_coverage(self):
+        # one curve per simulation, labeled by algorithm
+        for idx, curve in enumerate(self.out_coverage_curve):
+            if not curve:
+                continue
+            times, coverage = zip(*curve)
+            plt.plot(times, coverage, label=f'{idx+1} - {self.in_algorithms[idx].to_string()}')
+
+        plt.xlabel('Time (s)')
+        plt.ylabel('Coverage')
+        plt.title('Coverage of the grid')
+        plt.legend()
+        plt.show()
+
     def save_csv(self):
         if not SAVE_RESULTS:
             return
             
-        with open('result.csv', 'w', newline='') as file:
+        self.write_csv('result.csv')
+
+    def write_csv(self, filename):
+        with open(filename, 'w', newline='') as file:
             writer = csv.writer(file)
-            writer.writerow(["Execution", "N Drones", "N Obstacles", "Algorithm", "Time Found Target", "Time Mission Completed"])
+            writer.writerow(["Execution", "N Drones", "N Obstacles", "Algorithm", "Time Found Target", "Time Mission Completed", "Final Coverage"])
             print(len(self.out_time_mission))
-            for idx in range(0, self.in_repetitions):
+            for idx in range(0, len(self.out_time_mission)):
                 #writer.writerow([idx+1, self.in_num_swarm[idx], self.in_num_obstacles[idx], self.in_algorithms[idx], self.out_time_target[idx], self.out_time_mission[idx]])
-                writer.writerow([idx+1, self.in_num_swarm[idx], self.in_num_obstacles[idx], self.in_algorithms[idx].to_string(), self.out_time_target[idx], self.out_time_mission[idx]])
+                writer.writerow([idx+1, self.in_num_swarm[idx], self.in_num_obstacles[idx], self.in_algorithms[idx].to_string(), self.out_time_target[idx], self.out_time_mission[idx], self.get_final_coverage(idx)])
+
+    def write_coverage_csv(self, filename):
+        # one row per sample of the coverage curve of every simulation
+        with open(filename, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["Execution", "N Drones", "N Obstacles", "Algorithm", "Time", "Coverage"])
+            for idx, curve in enumerate(self.out_coverage_curve):
+                for time_sample, coverage in curve:
+                    writer.writerow([idx+1, self.in_num_swarm[idx], self.in_num_obstacles[idx], self.in_algorithms[idx].to_string(), time_sample, coverage])
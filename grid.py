@@ -1,11 +1,10 @@
 from constants import *
 import pygame as pg
-from math import atan2, pi, exp, floor
+from math import atan2, pi, exp, floor, ceil
 import random
 import copy 
 import numpy as np
-# importing "heapq" to implement heap queue
-import heapq
+from collections import namedtuple
 
 
 vec = pg.math.Vector2 
@@ -14,63 +13,310 @@ NOT_VISITED = 0
 VISITED = 1
 OBSTACLE = 2
 
+# cells per side of the blocks used to find the nearest unvisited cell
+BLOCK_SIZE = 8
+
+# 8-connected neighborhood
+NEIGHBORS_8 = [(dc, dr) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dc != 0 or dr != 0]
+
+# Connected group of frontier cells: number of cells, centroid in the world and cells (cols, rows)
+FrontierRegion = namedtuple('FrontierRegion', ['size', 'centroid', 'cols', 'rows'])
+
+# color of the center of the cell for every state
+STATE_COLORS = {
+    NOT_VISITED: (255,0,0),
+    VISITED: (0,255,0),
+    OBSTACLE: (0,0,255),
+}
+
 class GridField(object):
+    '''
+        Grid of cells covering the world. The state of every cell is kept in a uint8 array,
+        cell centers are computed from the resolution instead of stored.
+        cells[row][col] gives Cell views for code written for the old object array.
+    '''
     def __init__(self, resolution):
         self.cols =int(WORLD_WIDTH/resolution)  # Columns of the grid
         self.rows = int(WORLD_HEIGHT/resolution)  # Rows of the grid
-        self.cells =  np.ndarray((self.rows+1,self.cols+1), dtype=Cell) # grid memory using numpy array
         self.resolution = resolution # Resolution of grid relative to window width and height in pixels
+        # cells covering the whole world, the last ones may be partially outside of it
+        self.num_cols = int(ceil(WORLD_WIDTH/resolution))
+        self.num_rows = int(ceil(WORLD_HEIGHT/resolution))
+        self.states = np.full((self.num_rows, self.num_cols), NOT_VISITED, dtype=np.uint8) # grid memory
+        self.cells = CellsView(self) # compatibility layer: cells[row][col]
+        # number of cells in every state, updated on every change
+        self.state_counts = [self.states.size, 0, 0]
+        # number of unvisited cells in every block of BLOCK_SIZE x BLOCK_SIZE cells, updated on every change
+        # only cells inside (cols, rows) count, the same cells get_sucessors returns
+        self.block_unvisited = np.zeros((int(ceil(self.rows / BLOCK_SIZE)), int(ceil(self.cols / BLOCK_SIZE))), dtype=np.int32)
+        np.add.at(self.block_unvisited, tuple(np.indices((self.rows, self.cols)).reshape(2, -1) // BLOCK_SIZE), 1)
+        # frontier: unvisited cells next to a visited cell, inside (cols, rows), updated on every change
+        self.frontier = np.zeros((self.rows, self.cols), dtype=bool)
+        self.frontier_count = 0
+        self.frontier_version = 0 # incremented whenever the frontier changes
+        self.obstacle_version = 0 # incremented whenever a cell changes to or from OBSTACLE
+        self._frontier_regions = None # regions of frontier_version, computed on demand
+        # coverage over simulated time: list of (time, coverage)
+        self.coverage_curve = []
+        self.next_coverage_sample = 0
+        # offsets of the cells that may be inside a sensor footprint, by radius
+        self._stamps = {}
         print(f' Grid created with  col:{self.cols} row:{self.rows}')
-        #self.field = [[vec(random.uniform(0,1),random.uniform(0,1)) for col in range(self.cols)] for row in range(self.rows)] # create matrix 
-        self.h_cells = []
-        heapq.heapify(self.h_cells)
-
-        self.create_grid_cells()
         
-        # Optimization: Create a cached surface for the grid
-        self.surface = pg.Surface((WORLD_WIDTH, WORLD_HEIGHT), pg.SRCALPHA)
-        self._redraw_all()
+        # Optimization: cached surface for the grid, created on first draw
+        # so headless simulations never pay for it
+        self.surface = None
+        # cells whose state changed since the last call to pop_dirty_cells, None when nobody tracks them
+        self.dirty_cells = None
    
-    def create_grid_cells(self):
-        '''
-            Creates grid with cells according to resolution 
-        '''
-        blockSize = self.resolution
-        for x in range(0, WORLD_WIDTH, blockSize):
-            for y in range(0, WORLD_HEIGHT, blockSize):
-                row = int(y / blockSize)
-                col = int(x / blockSize)
-                self.cells[row][col] = Cell(vec(x, y), blockSize)
-                # Priority queue HEAP
-                heapq.heappush(self.h_cells, (self.cells[row][col].state, (row, col)))
+    def _in_grid(self, col, row):
+        return 0 <= col < self.num_cols and 0 <= row < self.num_rows
+
+    def _in_grid_batch(self, cols, rows):
+        return (cols >= 0) & (cols < self.num_cols) & (rows >= 0) & (rows < self.num_rows)
 
     def _redraw_all(self):
         """Redraws the entire grid onto the cached surface."""
-        blockSize = self.resolution
         self.surface.fill((0, 0, 0, 0)) # Clear with transparent
-        
+        self.draw_all(self.surface)
+
+    def draw_all(self, surface):
+        """Draws the lines and the center of every cell of the grid on surface."""
+        blockSize = self.resolution
         for x in range(0, WORLD_WIDTH, blockSize):
-            for y in range(0, WORLD_HEIGHT, blockSize):
-                rect = pg.Rect(x, y, blockSize, blockSize)
-                pg.draw.rect(self.surface, (120,120,120), rect, 1)
-                self.cells[int(y/blockSize)][int(x/blockSize)].draw_center(self.surface)
+            pg.draw.line(surface, (120,120,120), (x, 0), (x, WORLD_HEIGHT), 1)
+        for y in range(0, WORLD_HEIGHT, blockSize):
+            pg.draw.line(surface, (120,120,120), (0, y), (WORLD_WIDTH, y), 1)
 
-    def draw(self, screen):
+        rows, cols = np.indices(self.states.shape)
+        self.draw_cells(surface, cols.ravel(), rows.ravel())
+
+    def draw_cell(self, surface, col, row):
+        """
+            Draws the center of a cell on surface
+            return: rect drawn
+        """
+        return pg.draw.circle(surface, STATE_COLORS[self.states[row, col]], self._center(col, row), 3)
+
+    def draw_cells(self, surface, cols, rows):
+        """
+            Draws the center of many cells on surface
+            return: list of rects drawn
+        """
+        return [self.draw_cell(surface, col, row) for col, row in zip(cols.tolist(), rows.tolist())]
+
+    def _draw_cell(self, col, row):
+        """Draws the center of a cell onto the cached surface."""
+        self.draw_cell(self.surface, col, row)
+
+    def _draw_cells(self, cols, rows):
+        self.draw_cells(self.surface, cols, rows)
+
+    def _cells_dirty(self, cols, rows):
+        """Redraws changed cells on the cached surface and keeps them for pop_dirty_cells."""
+        if self.surface is not None:
+            self._draw_cells(cols, rows)
+        if self.dirty_cells is not None and len(cols):
+            self.dirty_cells.append((cols, rows))
+
+    def track_dirty_cells(self):
+        """Starts keeping the cells whose state changes, for layers drawn outside the grid."""
+        if self.dirty_cells is None:
+            self.dirty_cells = []
+
+    def pop_dirty_cells(self):
+        """
+            Cells whose state changed since the last call, every cell at most once
+            return: (cols, rows) arrays
+        """
+        if not self.dirty_cells:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        cols = np.concatenate([c for c, _ in self.dirty_cells])
+        rows = np.concatenate([r for _, r in self.dirty_cells])
+        self.dirty_cells = []
+        flat = np.unique(rows * self.num_cols + cols)
+        rows, cols = np.divmod(flat, self.num_cols)
+        return cols, rows
+
+    def draw(self, screen, visible=None, view=None):
+        '''
+            Draws the grid from the cached surface
+            visible: rect of the world on screen, only this area is drawn when given
+            view: DisplayManager to draw straight on the screen at its zoom, the cached surface is not used
+        '''
+        if view is not None:
+            self._draw_on_view(screen, view, visible if visible is not None else view.visible_world_rect())
+            return
+        if self.surface is None:
+            self.surface = pg.Surface((WORLD_WIDTH, WORLD_HEIGHT), pg.SRCALPHA)
+            self._redraw_all()
         # Blit the cached surface
-        screen.blit(self.surface, (0, 0))
+        if visible is None:
+            screen.blit(self.surface, (0, 0))
+        else:
+            screen.blit(self.surface, visible, visible)
+
+    def _draw_on_view(self, screen, view, visible):
+        '''Draws lines and centers of the cells inside visible, transformed to the screen'''
+        res = self.resolution
+        zoom = view.zoom_level
+        c0, c1 = max(visible.left // res, 0), min(-(-visible.right // res), self.num_cols)
+        r0, r1 = max(visible.top // res, 0), min(-(-visible.bottom // res), self.num_rows)
+        if c0 >= c1 or r0 >= r1:
+            return
+
+        # lines are skipped when cells are too small on the screen to tell them apart
+        if res * zoom >= GRID_LINE_MIN_PIXELS:
+            top = view.world_to_screen(vec(0, visible.top)).y
+            bottom = view.world_to_screen(vec(0, visible.bottom)).y
+            left = view.world_to_screen(vec(visible.left, 0)).x
+            right = view.world_to_screen(vec(visible.right, 0)).x
+            for x in range(c0 * res, min(c1 * res, WORLD_WIDTH - 1) + 1, res):
+                sx = x * zoom + view.offset.x
+                pg.draw.line(screen, (120,120,120), (sx, top), (sx, bottom), 1)
+            for y in range(r0 * res, min(r1 * res, WORLD_HEIGHT - 1) + 1, res):
+                sy = y * zoom + view.offset.y
+                pg.draw.line(screen, (120,120,120), (left, sy), (right, sy), 1)
+
+        rows, cols = np.mgrid[r0:r1, c0:c1]
+        centers = self.get_cell_centers(cols.ravel(), rows.ravel()) * zoom + (view.offset.x, view.offset.y)
+        states = self.states[r0:r1, c0:c1].ravel()
+        radius = max(1, round(3 * zoom))
+        for (x, y), state in zip(centers.tolist(), states.tolist()):
+            pg.draw.circle(screen, STATE_COLORS[state], (x, y), radius)
 
     def change_state_cell(self, cell, to_state = VISITED):
         '''
             Cell is visitated
+            cell: tuple (col, row)
+        '''
+        col, row = cell
+        if not self._in_grid(col, row):
+            return
+        state = self.states[row, col]
+        if state != to_state and state != OBSTACLE:
+            self.states[row, col] = to_state
+            self._cell_changed(col, row, state, to_state)
+            # Update only this cell on the cached surface
+            self._cells_dirty(np.array([col]), np.array([row]))
+
+    def change_state_cells(self, cols, rows, to_state = VISITED):
+        '''
+            Changes the state of many cells at once, cells outside the grid are ignored
+
+            cols, rows: arrays of cell coordinates
+            return: (cols, rows) of the cells whose state changed
+        '''
+        cols = np.asarray(cols, dtype=np.intp).ravel()
+        rows = np.asarray(rows, dtype=np.intp).ravel()
+        inside = self._in_grid_batch(cols, rows)
+        flat = rows[inside] * self.num_cols + cols[inside]
+        states = self.states.ravel()
+        # most cells are already in to_state, filters them before removing duplicates
+        current = states[flat]
+        flat = np.unique(flat[(current != to_state) & (current != OBSTACLE)])
+        current = states[flat]
+        states[flat] = to_state
+
+        rows, cols = np.divmod(flat, self.num_cols)
+        self._cells_changed(cols, rows, current, to_state)
+        self._cells_dirty(cols, rows)
+        return cols, rows
+
+    def _cell_changed(self, col, row, from_state, to_state):
+        '''
+            Keeps the counters in sync after a cell changed from from_state to to_state
+        '''
+        self.state_counts[from_state] -= 1
+        self.state_counts[to_state] += 1
+        if OBSTACLE in (from_state, to_state):
+            self.obstacle_version += 1
+        if col < self.cols and row < self.rows:
+            block = (row // BLOCK_SIZE, col // BLOCK_SIZE)
+            self.block_unvisited[block] += int(to_state == NOT_VISITED) - int(from_state == NOT_VISITED)
+            self._update_frontier(np.array([col]), np.array([row]))
+
+    def _cells_changed(self, cols, rows, from_states, to_state):
+        '''
+            Keeps the counters in sync after many cells changed to to_state, from_states: array of previous states
         '''
-        try:
-            c = self.cells[cell[1]][cell[0]]
-            if c.state != to_state and c.state != OBSTACLE:
-                c.change_state(to_state)
-                # Update only this cell on the cached surface
-                c.draw_center(self.surface)
-        except:
-            pass
+        for state, count in enumerate(np.bincount(from_states, minlength=3)):
+            self.state_counts[state] -= int(count)
+        self.state_counts[to_state] += len(from_states)
+        if len(from_states) and (to_state == OBSTACLE or (from_states == OBSTACLE).any()):
+            self.obstacle_version += 1
+
+        counted = (cols < self.cols) & (rows < self.rows)
+        delta = int(to_state == NOT_VISITED) - (from_states[counted] == NOT_VISITED).astype(np.int32)
+        np.add.at(self.block_unvisited, (rows[counted] // BLOCK_SIZE, cols[counted] // BLOCK_SIZE), delta)
+        self._update_frontier(cols[counted], rows[counted])
+
+    def _update_frontier(self, cols, rows):
+        '''
+            Updates the frontier around cells that changed state: only those cells
+            and their 8 neighbors can enter or leave the frontier
+        '''
+        if len(cols) == 0:
+            return
+        cols = (cols[:, None] + np.array([0] + [dc for dc, _ in NEIGHBORS_8])).ravel()
+        rows = (rows[:, None] + np.array([0] + [dr for _, dr in NEIGHBORS_8])).ravel()
+        inside = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+        flat = np.unique(rows[inside] * self.cols + cols[inside])
+        rows, cols = np.divmod(flat, self.cols)
+
+        next_to_visited = np.zeros(len(flat), dtype=bool)
+        for dc, dr in NEIGHBORS_8:
+            nc, nr = cols + dc, rows + dr
+            valid = (nc >= 0) & (nc < self.cols) & (nr >= 0) & (nr < self.rows)
+            next_to_visited[valid] |= self.states[nr[valid], nc[valid]] == VISITED
+        is_frontier = (self.states[rows, cols] == NOT_VISITED) & next_to_visited
+
+        was_frontier = self.frontier[rows, cols]
+        changed = int(np.count_nonzero(is_frontier != was_frontier))
+        if changed:
+            self.frontier[rows, cols] = is_frontier
+            self.frontier_count += int(is_frontier.sum()) - int(was_frontier.sum())
+            self.frontier_version += 1
+            self._frontier_regions = None
+
+    def _get_stamp(self, radius):
+        '''
+            Offsets (cols, rows) of the cells that can intersect a footprint of the given radius
+            centered anywhere inside the cell (0,0), computed once per radius
+        '''
+        if radius not in self._stamps:
+            reach = int(ceil(radius / self.resolution))
+            dr, dc = np.mgrid[-reach:reach + 1, -reach:reach + 1]
+            # distance between the closest points of cell (0,0) and cell (dc,dr)
+            gap_x = np.maximum(np.abs(dc) - 1, 0) * self.resolution
+            gap_y = np.maximum(np.abs(dr) - 1, 0) * self.resolution
+            close = gap_x * gap_x + gap_y * gap_y <= radius * radius
+            self._stamps[radius] = (dc[close], dr[close])
+        return self._stamps[radius]
+
+    def mark_footprints(self, positions, radius = SENSOR_RADIUS, to_state = VISITED):
+        '''
+            Marks the cells covered by the sensor of every drone in one batched operation:
+            the cell under the drone and every cell whose center is within radius of it
+
+            positions: array (N,2) of positions of the drones
+            radius: radius of the sensor footprint in pixels
+            return: (cols, rows) of the cells whose state changed
+        '''
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        cols, rows = self.get_cell_of_positions(positions)
+        if radius <= 0:
+            return self.change_state_cells(cols, rows, to_state)
+
+        stamp_cols, stamp_rows = self._get_stamp(radius)
+        cols = cols[:, None] + stamp_cols[None, :]
+        rows = rows[:, None] + stamp_rows[None, :]
+        dx = (cols + 0.5) * self.resolution - positions[:, 0:1]
+        dy = (rows + 0.5) * self.resolution - positions[:, 1:2]
+        inside = dx * dx + dy * dy <= radius * radius
+        # the cell under the drone is always seen
+        inside |= (stamp_cols == 0) & (stamp_rows == 0)
+        return self.change_state_cells(cols[inside], rows[inside], to_state)
 
     def get_state_cell(self, cell):
         '''
@@ -78,10 +324,23 @@ class GridField(object):
             cell: tuple with coordenates
             return: state of the cell 
         '''
-        try:
-            return self.cells[cell[1]][cell[0]].state
-        except:
+        col, row = cell
+        if not self._in_grid(col, row):
             return VISITED
+        return self.states[row, col]
+
+    def get_state_cells(self, cols, rows):
+        '''
+            States of many cells at once, cells outside the grid are VISITED
+            cols, rows: arrays of cell coordinates
+            return: array of states
+        '''
+        cols = np.asarray(cols, dtype=np.intp)
+        rows = np.asarray(rows, dtype=np.intp)
+        inside = self._in_grid_batch(cols, rows)
+        states = np.full(cols.shape, VISITED, dtype=np.uint8)
+        states[inside] = self.states[rows[inside], cols[inside]]
+        return states
 
     def get_sucessors(self,cell):
         """
@@ -102,7 +361,7 @@ class GridField(object):
                     continue  # Skip the current cell
 
                 x, y = i + dx, j + dy
-                if 0 <= x < self.cols and 0 <= y < self.rows and self.get_state_cell((x, y)) == NOT_VISITED:
+                if 0 <= x < self.cols and 0 <= y < self.rows and self.states[y, x] == NOT_VISITED:
                     successors.append(self.get_cell_center((x, y)))
         
         return successors
@@ -113,43 +372,349 @@ class GridField(object):
         '''
         return (self.cols, self.rows)
 
+    def _center(self, col, row):
+        return vec((col + 0.5) * self.resolution, (row + 0.5) * self.resolution)
+
     def get_cell_center(self,cell):
-        return self.cells[cell[1]][cell[0]].get_cell_center()   
+        return self._center(cell[0], cell[1])
+
+    def get_cell_centers(self, cols, rows):
+        '''
+            Centers of many cells at once
+            return: array (N,2) with the position of the centers in the world
+        '''
+        cols = np.asarray(cols, dtype=float)
+        rows = np.asarray(rows, dtype=float)
+        return np.stack([(cols + 0.5) * self.resolution, (rows + 0.5) * self.resolution], axis=-1)
+
+    def get_cell_of_positions(self, positions):
+        '''
+            Cells containing the given world positions
+            return: (cols, rows) arrays
+        '''
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        cells = (positions // self.resolution).astype(np.intp)
+        return cells[:, 0], cells[:, 1]
+
+    def coverage_statistics(self):
+        '''
+            Number of cells in every state over the whole grid, read from the counters
+            return: dict with the number of cells not visited, visited and obstacles
+                    and coverage, the fraction of cells that are not obstacles already visited
+        '''
+        return {
+            'not_visited': self.state_counts[NOT_VISITED],
+            'visited': self.state_counts[VISITED],
+            'obstacle': self.state_counts[OBSTACLE],
+            'coverage': self.get_coverage(),
+        }
+
+    def get_coverage(self):
+        '''
+            Fraction of the cells that are not obstacles already visited
+        '''
+        free = self.state_counts[NOT_VISITED] + self.state_counts[VISITED]
+        return self.state_counts[VISITED] / free if free else 1.0
+
+    def record_coverage(self, sim_time, force=False):
+        '''
+            Appends the coverage to coverage_curve every COVERAGE_SAMPLE_TIME simulated seconds
+            sim_time: simulated seconds since the start of the simulation
+            force: records the sample even if the sample time has not passed
+        '''
+        if self.coverage_curve and self.coverage_curve[-1][0] == sim_time:
+            return
+        if sim_time >= self.next_coverage_sample or force:
+            self.coverage_curve.append((sim_time, self.get_coverage()))
+            # next multiple of the sample time, so samples do not drift
+            self.next_coverage_sample = (floor(sim_time / COVERAGE_SAMPLE_TIME) + 1) * COVERAGE_SAMPLE_TIME
     
-    def get_cell_not_visited(self):
+    def get_nearest_unvisited(self, position, k = 1):
+        '''
+            Finds the unvisited cells closest to a position.
+            Blocks around the position are searched in growing squares, skipping blocks
+            without unvisited cells, until no block outside the square can hold a closer cell.
+
+            position: position in the world
+            k: number of cells
+            return: list with the (col, row) of at most k cells, closest first
+        '''
+        if self.state_counts[NOT_VISITED] == 0 or k <= 0:
+            return []
+        block_rows, block_cols = self.block_unvisited.shape
+        block_px = BLOCK_SIZE * self.resolution
+        bc = min(max(int(position[0] // block_px), 0), block_cols - 1)
+        br = min(max(int(position[1] // block_px), 0), block_rows - 1)
+
+        ring = 0
+        while True:
+            # blocks within ring blocks of the block of the position
+            r0, r1 = max(br - ring, 0), min(br + ring + 1, block_rows)
+            c0, c1 = max(bc - ring, 0), min(bc + ring + 1, block_cols)
+            covers_grid = r0 == 0 and c0 == 0 and r1 == block_rows and c1 == block_cols
+            if self.block_unvisited[r0:r1, c0:c1].sum() >= k or covers_grid:
+                rows, cols = np.nonzero(self.states[r0 * BLOCK_SIZE:min(r1 * BLOCK_SIZE, self.rows),
+                                                    c0 * BLOCK_SIZE:min(c1 * BLOCK_SIZE, self.cols)] == NOT_VISITED)
+                rows += r0 * BLOCK_SIZE
+                cols += c0 * BLOCK_SIZE
+                dx = (cols + 0.5) * self.resolution - position[0]
+                dy = (rows + 0.5) * self.resolution - position[1]
+                dist2 = dx * dx + dy * dy
+                order = np.argsort(dist2, kind='stable')[:k]
+                # cells outside the square are at least ring blocks away from the position
+                if covers_grid or dist2[order[-1]] <= (ring * block_px) ** 2:
+                    return list(zip(cols[order].tolist(), rows[order].tolist()))
+            ring = max(1, ring * 2)
+
+    def get_nearest_unvisited_batch(self, positions, k = 1):
+        '''
+            Unvisited cells closest to many positions, in one query for all of them.
+            As in get_nearest_unvisited, squares of blocks around every position grow until they hold k
+            unvisited cells (counted with a summed-area table of the blocks), the farthest corner of the
+            square bounds the distance of the k-th closest cell. Only the cells of the blocks
+            closer than that bound are compared.
+
+            positions: array (N,2) of positions in the world
+            k: number of cells
+            return: list with the result of get_nearest_unvisited for every position
+        '''
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        if self.state_counts[NOT_VISITED] == 0 or k <= 0 or len(positions) == 0:
+            return [[] for _ in positions]
+        block_rows, block_cols = self.block_unvisited.shape
+        block_px = BLOCK_SIZE * self.resolution
+        px, py = positions[:, 0], positions[:, 1]
+        bc = np.clip(px // block_px, 0, block_cols - 1).astype(np.intp)
+        br = np.clip(py // block_px, 0, block_rows - 1).astype(np.intp)
+
+        # smallest square of blocks around every position holding k unvisited cells, or the whole grid
+        table = np.zeros((block_rows + 1, block_cols + 1), dtype=np.int64)
+        table[1:, 1:] = self.block_unvisited.cumsum(axis=0).cumsum(axis=1)
+        ring = np.zeros(len(positions), dtype=np.intp)
+        pending = np.arange(len(positions))
+        while len(pending):
+            r = ring[pending]
+            r0, r1 = np.maximum(br[pending] - r, 0), np.minimum(br[pending] + r + 1, block_rows)
+            c0, c1 = np.maximum(bc[pending] - r, 0), np.minimum(bc[pending] + r + 1, block_cols)
+            count = table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0]
+            covers_grid = (r0 == 0) & (c0 == 0) & (r1 == block_rows) & (c1 == block_cols)
+            pending = pending[(count < k) & ~covers_grid]
+            ring[pending] = np.maximum(1, ring[pending] * 2)
+
+        # blocks that can hold a cell closer than the farthest corner of the square
+        r0, r1 = np.maximum(br - ring, 0), np.minimum(br + ring + 1, block_rows)
+        c0, c1 = np.maximum(bc - ring, 0), np.minimum(bc + ring + 1, block_cols)
+        far_x = np.maximum(px - c0 * block_px, c1 * block_px - px)
+        far_y = np.maximum(py - r0 * block_px, r1 * block_px - py)
+        bound = far_x * far_x + far_y * far_y
+        reach = np.ceil(np.sqrt(bound) / block_px).astype(np.intp)
+        r0, r1 = np.maximum(br - reach, 0), np.minimum(br + reach + 1, block_rows)
+        c0, c1 = np.maximum(bc - reach, 0), np.minimum(bc + reach + 1, block_cols)
+        width = c1 - c0
+        sizes = (r1 - r0) * width
+        position_of = np.repeat(np.arange(len(positions)), sizes)
+        offset = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        block_r = r0[position_of] + offset // width[position_of]
+        block_c = c0[position_of] + offset % width[position_of]
+        near_x = np.maximum(np.maximum(block_c * block_px - px[position_of], px[position_of] - (block_c + 1) * block_px), 0)
+        near_y = np.maximum(np.maximum(block_r * block_px - py[position_of], py[position_of] - (block_r + 1) * block_px), 0)
+        keep = (self.block_unvisited[block_r, block_c] > 0) & (near_x * near_x + near_y * near_y <= bound[position_of])
+        position_of, block_r, block_c = position_of[keep], block_r[keep], block_c[keep]
+
+        # unvisited cells of those blocks, as BLOCK_SIZE x BLOCK_SIZE tiles
+        tiles = np.full((block_rows * BLOCK_SIZE, block_cols * BLOCK_SIZE), VISITED, dtype=np.uint8)
+        tiles[:self.rows, :self.cols] = self.states[:self.rows, :self.cols]
+        tiles = tiles.reshape(block_rows, BLOCK_SIZE, block_cols, BLOCK_SIZE)
+        pair, tile_row, tile_col = np.nonzero(tiles[block_r, :, block_c, :] == NOT_VISITED)
+        position_of = position_of[pair]
+        cell_rows = block_r[pair] * BLOCK_SIZE + tile_row
+        cell_cols = block_c[pair] * BLOCK_SIZE + tile_col
+        dx = (cell_cols + 0.5) * self.resolution - px[position_of]
+        dy = (cell_rows + 0.5) * self.resolution - py[position_of]
+        dist2 = dx * dx + dy * dy
+
+        # distance of the k-th closest cell of every position, cells are grouped by position
+        starts = np.searchsorted(position_of, np.arange(len(positions)))
+        kth = np.full(len(positions), -1.0)
+        for _ in range(k):
+            closer = np.add.reduceat((dist2 <= kth[position_of]).astype(np.intp), starts)
+            if (closer >= k).all():
+                break
+            following = np.minimum.reduceat(np.where(dist2 > kth[position_of], dist2, np.inf), starts)
+            kth = np.where(closer < k, following, kth)
+        close = dist2 <= kth[position_of]
+        position_of, cell_cols, cell_rows, dist2 = position_of[close], cell_cols[close], cell_rows[close], dist2[close]
+
+        # closest first, ties in row major order as get_nearest_unvisited
+        order = np.lexsort((cell_cols, cell_rows, dist2, position_of))
+        first = np.searchsorted(position_of[order], np.arange(len(positions) + 1))
+        rank = np.arange(len(order)) - first[position_of[order]]
+        keep = order[rank < k]
+        bounds = np.searchsorted(position_of[keep], np.arange(len(positions) + 1))
+        cell_cols, cell_rows = cell_cols[keep].tolist(), cell_rows[keep].tolist()
+        return [list(zip(cell_cols[bounds[i]:bounds[i+1]], cell_rows[bounds[i]:bounds[i+1]]))
+                for i in range(len(positions))]
+
+    def get_frontier_regions(self, min_size = 1):
+        '''
+            Groups the frontier in 8-connected regions. Computed once for every version of the frontier.
+
+            min_size: regions with less cells are ignored
+            return: list of FrontierRegion, largest first
+        '''
+        if self._frontier_regions is None:
+            self._frontier_regions = self._label_frontier()
+        return [region for region in self._frontier_regions if region.size >= min_size]
+
+    def _label_frontier(self):
+        '''
+            Connected components of the frontier, hooking every pair of neighbor cells
+            to the smallest label and compressing the labels until every pair agrees
+        '''
+        flat = np.flatnonzero(self.frontier)
+        if len(flat) == 0:
+            return []
+        rows, cols = np.divmod(flat, self.cols)
+
+        # pairs (a, b) of neighbor frontier cells, as indices in flat
+        pairs_a = []
+        pairs_b = []
+        for dc, dr in ((1, 0), (-1, 1), (0, 1), (1, 1)):
+            nc, nr = cols + dc, rows + dr
+            valid = (nc >= 0) & (nc < self.cols) & (nr < self.rows)
+            neighbor = nr[valid] * self.cols + nc[valid]
+            position = np.minimum(np.searchsorted(flat, neighbor), len(flat) - 1)
+            found = flat[position] == neighbor
+            pairs_a.append(np.flatnonzero(valid)[found])
+            pairs_b.append(position[found])
+        a = np.concatenate(pairs_a)
+        b = np.concatenate(pairs_b)
+
+        parent = np.arange(len(flat))
+        while True:
+            root_a, root_b = parent[a], parent[b]
+            if np.array_equal(root_a, root_b):
+                break
+            np.minimum.at(parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+            while True:
+                grandparent = parent[parent]
+                if np.array_equal(grandparent, parent):
+                    break
+                parent = grandparent
+
+        _, labels = np.unique(parent, return_inverse=True)
+        sizes = np.bincount(labels)
+        center_x = np.bincount(labels, weights=(cols + 0.5) * self.resolution) / sizes
+        center_y = np.bincount(labels, weights=(rows + 0.5) * self.resolution) / sizes
+        order = np.argsort(labels, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(sizes)])
+
+        regions = []
+        by_size = np.argsort(-sizes, kind='stable')
+        for label in by_size:
+            cells = order[bounds[label]:bounds[label + 1]]
+            regions.append(FrontierRegion(int(sizes[label]), vec(center_x[label], center_y[label]), cols[cells], rows[cells]))
+
+        # region of every frontier cell, for get_frontier_region_of
+        rank = np.empty_like(by_size)
+        rank[by_size] = np.arange(len(by_size))
+        self._frontier_cells = flat
+        self._frontier_cell_region = rank[labels]
+        return regions
+
+    def get_frontier_region_of(self, cols, rows):
+        '''
+            Index in get_frontier_regions() of the region of every cell, -1 for cells out of the frontier
+        '''
+        cols = np.asarray(cols, dtype=np.intp)
+        rows = np.asarray(rows, dtype=np.intp)
+        regions = np.full(cols.shape, -1, dtype=np.intp)
+        if not self.get_frontier_regions():
+            return regions
+        inside = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+        flat = rows[inside] * self.cols + cols[inside]
+        position = np.minimum(np.searchsorted(self._frontier_cells, flat), len(self._frontier_cells) - 1)
+        found = self._frontier_cells[position] == flat
+        regions[np.flatnonzero(inside)[found]] = self._frontier_cell_region[position[found]]
+        return regions
+
+    def get_cell_not_visited(self, position = (0, 0)):
         '''
             This method will return coordinates of a cell that wasn't visited yet
+            return: (row, col) of the unvisited cell closest to position, None if every cell was visited
         '''
-        while self.h_cells:
-            state, (row, col) = heapq.heappop(self.h_cells)
-            if state == NOT_VISITED:
-                return (row, col)
-        return None  # If no unvisited cell is found
+        nearest = self.get_nearest_unvisited(position)
+        if not nearest:
+            return None  # If no unvisited cell is found
+        col, row = nearest[0]
+        return (row, col)
+
+
+class CellsView(object):
+    '''
+        Compatibility layer: cells[row][col] (or cells[row, col]) returns a Cell view of the grid
+    '''
+    def __init__(self, grid):
+        self.grid = grid
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            row, col = key
+            return Cell(self.grid, row, col)
+        return CellsRowView(self.grid, key)
+
+    def __len__(self):
+        return self.grid.num_rows
+
+
+class CellsRowView(object):
+    def __init__(self, grid, row):
+        self.grid = grid
+        self.row = row
+
+    def __getitem__(self, col):
+        return Cell(self.grid, self.row, col)
+
+    def __len__(self):
+        return self.grid.num_cols
 
 
 class Cell():
     '''
         Represents a cell in the grid
         Every cell represents an area in the map that is being searched
+        It is a view of one position of the GridField arrays
     '''
-    def __init__(self, pos, blockSize):
-        self.size_block = blockSize
-        self.position = pos
-        self.state = NOT_VISITED
-        self.center_in_coord_global = vec(self.position[0]+ self.size_block/2, self.position[1]+ self.size_block/2)
+    def __init__(self, grid, row, col):
+        if not grid._in_grid(col, row):
+            raise IndexError(f'cell ({row}, {col}) is outside the grid')
+        self.grid = grid
+        self.row = row
+        self.col = col
+        self.size_block = grid.resolution
+        self.position = vec(col * grid.resolution, row * grid.resolution)
+
+    @property
+    def state(self):
+        return self.grid.states[self.row, self.col]
+
+    @state.setter
+    def state(self, value):
+        previous = self.state
+        self.grid.states[self.row, self.col] = value
+        self.grid._cell_changed(self.col, self.row, previous, value)
+        self.grid._cells_dirty(np.array([self.col]), np.array([self.row]))
+
+    @property
+    def center_in_coord_global(self):
+        return self.get_cell_center()
 
     def draw_center(self,screen):
-        
-        if self.state == NOT_VISITED:
-            pg.draw.circle(screen, (255,0,0), vec(self.position[0]+ self.size_block/2, self.position[1]+ self.size_block/2), 3)
-        if self.state == VISITED: 
-            pg.draw.circle(screen, (0,255,0), vec(self.position[0]+ self.size_block/2, self.position[1]+ self.size_block/2), 3)
-        if self.state == OBSTACLE:
-            pg.draw.circle(screen, (0,0,255), vec(self.position[0]+ self.size_block/2, self.position[1]+ self.size_block/2), 3)
+        pg.draw.circle(screen, STATE_COLORS[self.state], self.get_cell_center(), 3)
 
     def change_state(self, state = VISITED):
         if self.state != OBSTACLE:
             self.state = state
     
     def get_cell_center(self):
-        return self.center_in_coord_global
\ No newline at end of file
+        return self.grid._center(self.col, self.row)
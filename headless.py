@@ -0,0 +1,94 @@
+"""
+    Headless entry point: runs the planned simulations without a display.
+    Physics, grid and state machines are stepped as fast as the CPU allows,
+    no pygame surface is created and nothing is drawn.
+
+    Example:
+        python headless.py --repetitions 10 --swarm 10 20 --obstacles 20 --algorithms RowScan MeshScan
+        python headless.py --repetitions 10 --swarm 10 20 --algorithms RowScan MeshScan --workers 8
+"""
+import argparse
+import sys
+import traceback
+
+from constants import NUM_DRONES, NUM_OBSTACLES
+from experiment_manager import ExperimentManager
+from scan import SCAN_ALGORITHMS
+from simulation import Simulation
+from sweep_runner import SweepRunner
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Runs drone swarm simulations without a display.')
+    parser.add_argument('--repetitions', type=int, default=1,
+                        help='repetitions of every combination of the plan')
+    parser.add_argument('--swarm', type=int, nargs='+', default=[NUM_DRONES],
+                        help='swarm sizes to simulate')
+    parser.add_argument('--obstacles', type=int, nargs='+', default=[NUM_OBSTACLES],
+                        help='number of obstacles to simulate')
+    parser.add_argument('--algorithms', nargs='+', default=['DefineTargetScan'],
+                        choices=sorted(SCAN_ALGORITHMS),
+                        help='scan algorithms to simulate')
+    parser.add_argument('--output', default=None,
+                        help='CSV file to save the results')
+    parser.add_argument('--coverage-output', default=None,
+                        help='CSV file to save the coverage curve of every simulation')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes running the plan in parallel (0 uses every CPU available)')
+    return parser.parse_args(argv)
+
+
+def run_headless(experiment_manager: ExperimentManager, seed: int = 0) -> ExperimentManager:
+    """Runs every simulation planned in the experiment manager without drawing.
+
+    Args:
+        experiment_manager: plan of simulations to be executed
+        seed: seed of the obstacles generator and of the random generators of every simulation
+
+    Returns:
+        ExperimentManager: the same manager, filled with the outputs of every simulation
+    """
+    simulation = Simulation(None, experiment_manager, seed, run_seed=seed)
+    while simulation.run_simulation():
+        pass
+    return experiment_manager
+
+
+def print_results(experiment_manager: ExperimentManager) -> None:
+    for idx in range(len(experiment_manager.out_time_mission)):
+        print(f'{idx+1} - Algorithm: {experiment_manager.in_algorithms[idx].to_string()}, '
+              f'num_swarm: {experiment_manager.in_num_swarm[idx]}, '
+              f'num_obstacles: {experiment_manager.in_num_obstacles[idx]}, '
+              f'Time Target: {experiment_manager.out_time_target[idx]}, '
+              f'Time Mission: {experiment_manager.out_time_mission[idx]}, '
+              f'num_uav: {experiment_manager.out_num_uav[idx]}, '
+              f'Coverage: {experiment_manager.get_final_coverage(idx):.3f}')
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    algorithms = [SCAN_ALGORITHMS[name]() for name in args.algorithms]
+    experiment_manager = ExperimentManager(args.repetitions, args.swarm, args.obstacles, algorithms)
+
+    if args.workers == 1:
+        run_headless(experiment_manager)
+    else:
+        SweepRunner(args.workers or None).run(experiment_manager)
+    print_results(experiment_manager)
+
+    if args.output:
+        experiment_manager.write_csv(args.output)
+        print(f'Simulation results saved to {args.output}')
+
+    if args.coverage_output:
+        experiment_manager.write_coverage_csv(args.coverage_output)
+        print(f'Coverage curves saved to {args.coverage_output}')
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Fatal application error: {e}")
+        traceback.print_exc()
+        sys.exit(1)
@@ -3,13 +3,19 @@ import random
 import pygame
 import matplotlib.pyplot as plt
 from pygame.math import Vector2
-from constants import SCREEN_WIDTH, SCREEN_HEIGHT, WORLD_WIDTH, WORLD_HEIGHT, LIGHT_BLUE, FREQUENCY, SAVE_RESULTS
+from constants import (LIGHT_BLUE, FREQUENCY, SAMPLE_TIME, SAVE_RESULTS, FAST_MODE,
+                       TIME_WARP, TIME_WARP_LEVELS, MAX_FRAME_TIME,
+                       SCREEN_WIDTH, SCREEN_HEIGHT, WORLD_WIDTH, WORLD_HEIGHT,
+                       DIRTY_RECT_RENDERING, DIRTY_RECT_MAX_AREA, TRAILS)
 from scan import DefineTargetScan, RowScan, MeshScan, SnookerScan, RandoWalkScan
 from obstacle import Obstacles
 from simulation import Simulation
 from display_manager import DisplayManager
 from experiment_manager import ExperimentManager
 from grid import GridField
+from render_layers import StaticLayerCache, TrailLayer
+from screen_renderer import ScreenRenderer
+import assets
 import csv
 from datetime import datetime
 import traceback
@@ -23,9 +29,16 @@ class DroneSimulation:
         pygame.init()
         self.display_manager = DisplayManager()
         
-        # Load and scale background once
-        self.background_image = self._load_background()
-        
+        # Run as fast as possible, mission times are simulated so they do not change
+        self.fast_mode = FAST_MODE
+        # Simulated seconds per real second (keys +/-) and simulated time owed to the fixed-step loop
+        self.time_warp = TIME_WARP
+        self.time_accumulator = 0.0
+
+        # UI drawn over the world in the current and previous frames
+        self.ui_items = []
+        self.ui_rects = []
+
         # Setup simulation with scan algorithms
         self.experiment_manager = ExperimentManager(
             10, 
@@ -38,11 +51,15 @@ class DroneSimulation:
             self.display_manager, 
             self.experiment_manager
         )
+        # Draw straight on the screen (vector renderer) or through the world surface and its cached layers
+        self.screen_renderer = ScreenRenderer(self.display_manager)
+        # Background and the static layer are world-sized, created the first time the world surface is used
+        self.background_image = None
         
     def _load_background(self):
         """Load and prepare the background image."""
         try:
-            bg_image = pygame.image.load("models/texture/camouflage.png").convert()
+            bg_image = assets.load_image("models/texture/camouflage.png", alpha=False)
             return pygame.transform.scale(bg_image, (WORLD_WIDTH, WORLD_HEIGHT))
         except pygame.error as e:
             print(f"Error loading background: {e}")
@@ -61,6 +78,21 @@ class DroneSimulation:
             if event.type == pygame.KEYDOWN and event.key == pygame.K_d:
                 for drone in self.simulation.swarm:
                     drone.set_debug()
+
+            # Toggle fast mode with 'f' key
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+                self.fast_mode = not self.fast_mode
+
+            # Speed up / slow down simulated time with '+' and '-' keys
+            if event.type == pygame.KEYDOWN and event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.change_time_warp(1)
+            if event.type == pygame.KEYDOWN and event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.change_time_warp(-1)
+
+            # Toggle the screen renderer with 'v' key
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_v:
+                self.display_manager.screen_space = not self.display_manager.screen_space
+                self.simulation.swarm_manager.update_window()
                     
             # Handle mouse events
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -80,14 +112,42 @@ class DroneSimulation:
                 self.display_manager.handle_zoom(event)
                     
         return True
+
+    def change_time_warp(self, direction):
+        """Moves the time warp to the next (direction 1) or previous (direction -1) of TIME_WARP_LEVELS."""
+        levels = TIME_WARP_LEVELS
+        if direction > 0:
+            self.time_warp = next((w for w in levels if w > self.time_warp), levels[-1])
+        else:
+            self.time_warp = next((w for w in reversed(levels) if w < self.time_warp), levels[0])
+
+    def steps_for_frame(self, elapsed):
+        """
+        Number of fixed SAMPLE_TIME steps to run before rendering a frame.
+        Simulated time advances by elapsed real seconds times the time warp, a slow frame
+        is followed by more steps instead of slowing the simulation (frames are dropped).
+        Fast mode runs as many steps as the time warp per frame, without the real clock.
+        """
+        if self.fast_mode:
+            self.time_accumulator = 0.0
+            return max(1, int(round(self.time_warp)))
+        # past MAX_FRAME_TIME the simulation slows down instead of never catching up
+        self.time_accumulator += min(elapsed, MAX_FRAME_TIME) * self.time_warp
+        steps = int(self.time_accumulator / SAMPLE_TIME)
+        self.time_accumulator -= steps * SAMPLE_TIME
+        return steps
     
     def render_ui(self):
-        """Render UI elements and text."""
+        """
+        Render UI elements and text into self.ui_items, a list of (image, position)
+        blitted on the screen after the world.
+        """
+        self.ui_items = []
         # App title
-        title = self.display_manager.font24.render(
-            'Swarm Search using Drones', True, LIGHT_BLUE
+        title = self.display_manager.render_text(
+            self.display_manager.font24, 'Swarm Search using Drones', LIGHT_BLUE
         )
-        self.display_manager.screen.blit(title, (20, 20))
+        self.ui_items.append((title, (20, 20)))
         
         # Safely get current algorithm
         try:
@@ -99,17 +159,24 @@ class DroneSimulation:
             else:
                 search = "Unknown"
                 
-            search_text = self.display_manager.font24.render(
-                f'Search using: {search}', True, LIGHT_BLUE
+            search_text = self.display_manager.render_text(
+                self.display_manager.font24, f'Search using: {search}', LIGHT_BLUE
             )
-            self.display_manager.screen.blit(search_text, (800, 20))
+            self.ui_items.append((search_text, (800, 20)))
         except Exception as e:
             print(f"Error rendering search algorithm: {e}")
             # Fallback text if there's an error
-            fallback = self.display_manager.font24.render(
-                'Search algorithm: N/A', True, LIGHT_BLUE
+            fallback = self.display_manager.render_text(
+                self.display_manager.font24, 'Search algorithm: N/A', LIGHT_BLUE
             )
-            self.display_manager.screen.blit(fallback, (800, 20))
+            self.ui_items.append((fallback, (800, 20)))
+
+        # Simulated time of current mission
+        mode = f' x{self.time_warp:g}' + (' (fast)' if self.fast_mode else '')
+        time_text = self.display_manager.render_text(
+            self.display_manager.font24, f'Time: {self.simulation.time_executing:.1f} s{mode}', LIGHT_BLUE
+        )
+        self.ui_items.append((time_text, (1400, 20)))
         
         # Render mission stats
         self._render_mission_stats()
@@ -137,86 +204,94 @@ class DroneSimulation:
                         f'{idx+1} - Search: {search} - '
                         f'Scan Time: {time:.2f}, {sim_idx_info}'
                     )
-                    img = self.display_manager.font20.render(text, True, LIGHT_BLUE)
+                    img = self.display_manager.render_text(self.display_manager.font20, text, LIGHT_BLUE)
                 except:
                     # Simple fallback text
                     text = f'{idx+1} - Scan Time: {time:.2f}'
-                    img = self.display_manager.font16.render(text, True, LIGHT_BLUE)
+                    img = self.display_manager.render_text(self.display_manager.font16, text, LIGHT_BLUE)
                     
-                self.display_manager.screen.blit(img, (20, 20*(idx+2)))
+                self.ui_items.append((img, (20, 20*(idx+2))))
         except Exception as e:
             # If even the rendering of mission stats fails
             print(f"Error rendering mission stats: {e}")
-            img = self.display_manager.font16.render("Error displaying mission stats", True, LIGHT_BLUE)
-            self.display_manager.screen.blit(img, (20, 40))
+            img = self.display_manager.render_text(
+                self.display_manager.font16, "Error displaying mission stats", LIGHT_BLUE
+            )
+            self.ui_items.append((img, (20, 40)))
     
+    def present(self):
+        '''
+            Draws the simulation and the UI on the screen and updates the display.
+            Zoomed in, the simulation is drawn on the world surface and the screen sampled from it.
+            Zoomed out, the static layer is sampled from its mipmaps and the drones are drawn straight on the screen.
+            With the screen renderer everything is drawn straight on the screen at any zoom.
+            Only the rects that changed and the UI are redrawn and pushed to the display,
+            the whole frame is redrawn when the view changed or most of it is dirty.
+        '''
+        dm = self.display_manager
+        ui_rects = [pygame.Rect(position, image.get_size()) for image, position in self.ui_items]
+        if dm.screen_space:
+            self.screen_renderer.draw(self.simulation)
+            dm.screen.blits(self.ui_items, doreturn=False)
+            self.ui_rects = ui_rects
+            pygame.display.flip()
+            return
+
+        if self.simulation.static_layer is None:
+            # background, grid and obstacles are rendered once per simulation, the trails accumulate over them
+            self.background_image = self._load_background()
+            trails = TrailLayer() if TRAILS else None
+            self.simulation.static_layer = StaticLayerCache(self.background_image, dm.min_zoom, trails)
+        if not DIRTY_RECT_RENDERING:
+            self.simulation.draw()
+            dm.draw_world(dm.world_surface)
+            dm.screen.blits(self.ui_items, doreturn=False)
+            pygame.display.flip()
+            return
+
+        full_frame = dm.view_changed()
+        if dm.zoom_level < 1 and self.simulation.static_layer is not None:
+            screen_rects = self.simulation.draw_zoomed_out(dm, self.ui_rects + ui_rects, full_frame)
+        else:
+            world_rects = self.simulation.draw()
+            screen_rects = [dm.world_rect_to_screen(r) for r in world_rects] + self.ui_rects + ui_rects
+            area = sum(r.width * r.height for r in screen_rects)
+            if full_frame or area > DIRTY_RECT_MAX_AREA * SCREEN_WIDTH * SCREEN_HEIGHT:
+                screen_rects = [dm.screen_rect]
+            dm.draw_world_rects(dm.world_surface, screen_rects)
+        dm.screen.blits(self.ui_items, doreturn=False)
+        self.ui_rects = ui_rects
+
+        area = sum(r.width * r.height for r in screen_rects)
+        if area > DIRTY_RECT_MAX_AREA * SCREEN_WIDTH * SCREEN_HEIGHT:
+            pygame.display.flip()
+        else:
+            pygame.display.update(screen_rects)
+
     def run(self):
         """Main simulation loop with robust error handling."""
         running = True
         
         try:
             while running:
-                # Handle frame timing
-                self.display_manager.clock.tick(FREQUENCY)
+                # Handle frame timing, frames are drawn at most FREQUENCY times per second, fast mode removes the throttle
+                if self.fast_mode:
+                    elapsed = self.display_manager.clock.tick()
+                else:
+                    elapsed = self.display_manager.clock.tick(FREQUENCY)
                 # Process events
                 running = self.handle_events()
                 
-                # Draw background
-                # Draw background to world surface
-                self.display_manager.world_surface.blit(self.background_image, (0, 0))
-                
-                # Update simulation state
-                sim_running = self.simulation.run_simulation()
-                if not sim_running:
-                    running = False
-                
-    
-                # Smart rendering to avoid scaling huge surfaces
-                zoom = self.display_manager.zoom_level
-                offset = self.display_manager.offset
-                
-                self.display_manager.screen.fill((50, 50, 50)) # Clear screen
-
-                # If zoomed in enough that world covers screen (or mostly)
-                # We crop the visible area and scale ONLY that.
-                # This prevents creating massive surfaces (e.g. 20k x 10k pixels) when zooming in.
-                if zoom > 1.0:
-                    # Calculate visible world area
-                    # world_x = (screen_x - offset_x) / zoom
-                    wx = -offset.x / zoom
-                    wy = -offset.y / zoom
-                    ww = SCREEN_WIDTH / zoom
-                    wh = SCREEN_HEIGHT / zoom
-                    
-                    # Clamp to world bounds to avoid errors
-                    wx = max(0, wx)
-                    wy = max(0, wy)
-                    ww = min(ww, WORLD_WIDTH - wx)
-                    wh = min(wh, WORLD_HEIGHT - wy)
-                    
-                    if ww > 0 and wh > 0:
-                        try:
-                            subsurf = self.display_manager.world_surface.subsurface(pygame.Rect(wx, wy, ww, wh))
-                            scaled_surf = pygame.transform.scale(subsurf, (int(ww * zoom), int(wh * zoom)))
-                            self.display_manager.screen.blit(scaled_surf, (0, 0))
-                        except Exception as e:
-                            # Fallback if subsurface fails (e.g. out of bounds due to float precision)
-                            print(f"Render error: {e}")
-                            pass
-                else:
-                    # Zoomed out or normal: scale the whole world (it's small enough)
-                    scaled_surface = pygame.transform.scale(
-                        self.display_manager.world_surface, 
-                        (int(WORLD_WIDTH * zoom), 
-                         int(WORLD_HEIGHT * zoom))
-                    )
-                    self.display_manager.screen.blit(scaled_surface, offset)
+                # Update simulation state, as many fixed steps as the simulated time owed to this frame
+                for _ in range(self.steps_for_frame(elapsed / 1000)):
+                    if not self.simulation.run_simulation():
+                        running = False
+                        break
 
                 # Render UI elements (on top of everything, not zoomed)
                 self.render_ui()
-                
-                # Update display
-                pygame.display.flip()
+                # Draw the static layer (background, grid, obstacles), target, drones and UI to the screen
+                self.present()
                 
             # Wait briefly when simulation ends
             pygame.time.wait(1000)
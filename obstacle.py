@@ -2,44 +2,127 @@ import random
 import pygame as pg
 from utils import Tree
 from constants import *
+from spatial_hash import SpatialHash
+from quadtree import Rect
+from repulsion_field import RepulsionField
 
 vec2 = pg.math.Vector2
 
 
 class Obstacles(object):
-    def __init__(self, num_of_obstacles, map_size):
+    def __init__(self, num_of_obstacles, map_size, seed=0):
         super().__init__()
         self.num_of_obstacles = num_of_obstacles
         self.map_size = map_size
         self.obst = []
         # Use a local Random instance to avoid affecting global state
-        self.rng = random.Random(0)
+        self.seed = seed
+        self.rng = random.Random(seed)
         self.times_generated = 0
-        # Variables to draw tree using Sprites
-        self.tree = Tree() 
-        self.all_sprites = pg.sprite.Group()
-        self.all_sprites.add(self.tree)
+        # Static spatial index of obstacles, rebuilt on every generate_obstacles
+        # cells sized to the distance drones start avoiding obstacles
+        self.avoid_distance = AVOID_OBSTACLES + AVOID_DISTANCE
+        self.index = SpatialHash(self.avoid_distance, map_size[0], map_size[1])
+        # Optional precomputed raster of the repulsion force
+        self.repulsion_field = None
+        # Variables to draw tree using Sprites, loaded on first draw
+        self.tree = None
+        self.all_sprites = None
+        self._view_sprite = None # (zoom, tree sprite scaled to it), used to draw on the screen
         
     def generate_obstacles(self):
         self.obst = []
         self.times_generated += 1
         # Seed the local generator, not the global one
-        self.rng.seed(self.times_generated+10 )
+        self.rng.seed(self.seed + self.times_generated+10 )
         valid = False
         for _ in range(self.num_of_obstacles):
             coord = vec2(self.rng.uniform(200,self.map_size[0] + AVOID_OBSTACLES),
                         self.rng.uniform(RADIUS_TARGET,self.map_size[1])- AVOID_OBSTACLES)
 
             self.obst.append(coord) 
+
+        self.index.build([(o.x, o.y) for o in self.obst])
+        if USE_REPULSION_FIELD:
+            self.build_repulsion_field(REPULSION_FIELD_RESOLUTION)
+        else:
+            self.repulsion_field = None
+
+    def build_repulsion_field(self, resolution=REPULSION_FIELD_RESOLUTION):
+        '''
+            Precomputes the repulsion force of the current obstacles on a raster
+        '''
+        self.repulsion_field = RepulsionField(self.obst, resolution, self.map_size[0], self.map_size[1])
+        return self.repulsion_field
                                   
     def get_coordenates(self):
         return self.obst
 
-    def reset_seed(self):
-        self.rng.seed(0)
-        self.times_generated = 0
+    def query_nearby(self, position, radius=None):
+        '''
+            Obstacles within radius of position (default: distance drones start avoiding obstacles)
+            return: list of obstacle positions
+        '''
+        offsets, indices = self.query_nearby_batch([(position[0], position[1])], radius)
+        return [self.obst[i] for i in indices]
+
+    def query_nearby_batch(self, positions, radius=None):
+        '''
+            Obstacles within radius of every position, for the whole swarm at once
+            return: (offsets, indices) obstacles close to position i are
+                    self.obst[indices[offsets[i]:offsets[i+1]]]
+        '''
+        if radius is None:
+            radius = self.avoid_distance
+        return self.index.query_radius_batch(positions, radius)
+
+    def reset_seed(self, times_generated=0):
+        '''
+            Restarts the sequence of layouts, the next generate_obstacles creates layout times_generated + 1
+        '''
+        self.rng.seed(self.seed)
+        self.times_generated = times_generated
         
 
-    def draw(self):
-        self.all_sprites.draw(self.window)
-        self.all_sprites.update(self.location,self.rotation)
\ No newline at end of file
+    def draw(self, surface, visible=None, view=None):
+        '''
+            Draws the obstacles, only the ones close to the visible rect of the world when given
+            view: DisplayManager to draw straight on the screen at its zoom, None draws in world coordinates
+        '''
+        # Sprites are only loaded when obstacles are drawn for the first time
+        if self.all_sprites is None:
+            self.tree = Tree()
+            self.all_sprites = pg.sprite.Group()
+            self.all_sprites.add(self.tree)
+
+        obstacles = self.obst
+        if visible is not None:
+            area = visible.inflate(2 * VIEW_CULL_MARGIN, 2 * VIEW_CULL_MARGIN)
+            indices = self.index.query_indices(Rect(area.centerx, area.centery, area.width / 2, area.height / 2))
+            obstacles = [self.obst[i] for i in indices]
+
+        if view is not None:
+            self._draw_on_view(surface, obstacles, view)
+            return
+
+        # draws the sprites of tree
+        for o in obstacles:
+            self.all_sprites.update(o,0)
+            self.all_sprites.draw(surface)
+            pg.draw.circle(surface,(200, 200, 200), o, radius=RADIUS_OBSTACLES, width=1)
+            pg.draw.circle(surface,(200, 200, 200), o, radius=RADIUS_OBSTACLES*1.6 + AVOID_DISTANCE, width=1)
+
+    def _draw_on_view(self, surface, obstacles, view):
+        '''Draws the obstacles transformed to the screen, the tree sprite is scaled once per zoom level'''
+        zoom = view.zoom_level
+        if self._view_sprite is None or self._view_sprite[0] != zoom:
+            self._view_sprite = (zoom, pg.transform.rotozoom(self.tree.sprites[0], 0, zoom))
+        image = self._view_sprite[1]
+        for o in obstacles:
+            # same anchor as Tree.update
+            base = view.world_to_screen(vec2(o[0], o[1] + 20))
+            surface.blit(image, image.get_rect(midbottom=(base.x, base.y)))
+            center = view.world_to_screen(vec2(o[0], o[1]))
+            pg.draw.circle(surface,(200, 200, 200), center, radius=view.scale_length(RADIUS_OBSTACLES), width=1)
+            pg.draw.circle(surface,(200, 200, 200), center,
+                           radius=view.scale_length(RADIUS_OBSTACLES*1.6 + AVOID_DISTANCE), width=1)
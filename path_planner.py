@@ -0,0 +1,174 @@
+import heapq
+from collections import OrderedDict
+from math import sqrt
+
+import numpy as np
+import pygame
+
+from constants import RADIUS_OBSTACLES, PATH_OBSTACLE_INFLATION, PATH_CACHE_SIZE
+from grid import OBSTACLE, NEIGHBORS_8
+
+vec2 = pygame.math.Vector2
+
+SQRT2 = sqrt(2)
+
+
+class PathPlanner(object):
+    '''
+        A* over the cells of a GridField, 8-connected.
+        Cells marked as OBSTACLE and cells inside obstacles inflated by PATH_OBSTACLE_INFLATION are blocked.
+        Paths are kept in an LRU cache keyed by (start cell, goal cell). When cells of the grid change
+        to OBSTACLE only the paths crossing them are dropped, blocking cells can not shorten the others.
+        The cache is emptied when a cell stops being an OBSTACLE.
+    '''
+    def __init__(self, grid, obstacles=(), inflation=PATH_OBSTACLE_INFLATION, cache_size=PATH_CACHE_SIZE):
+        """
+        Args:
+            grid: GridField the paths are planned on
+            obstacles: positions of the obstacles
+            inflation: distance kept from the border of the obstacles
+            cache_size: number of paths kept in the cache
+        """
+        self.grid = grid
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self._version = None
+        self._blocked = None
+
+        # cells covered by the inflated obstacles, they do not change during a simulation
+        self.obstacle_mask = np.zeros((grid.rows, grid.cols), dtype=bool)
+        radius = RADIUS_OBSTACLES + inflation
+        res = grid.resolution
+        for o in obstacles:
+            c0 = max(int((o[0] - radius) // res), 0)
+            c1 = min(int((o[0] + radius) // res) + 1, grid.cols)
+            r0 = max(int((o[1] - radius) // res), 0)
+            r1 = min(int((o[1] + radius) // res) + 1, grid.rows)
+            if c0 >= c1 or r0 >= r1:
+                continue
+            dx = (np.arange(c0, c1) + 0.5) * res - o[0]
+            dy = (np.arange(r0, r1) + 0.5) * res - o[1]
+            self.obstacle_mask[r0:r1, c0:c1] |= dx[None, :] ** 2 + dy[:, None] ** 2 <= radius * radius
+
+    @property
+    def blocked(self):
+        '''Blocked cells of the current version of the grid, cached paths no longer valid are dropped'''
+        if self._version != self.grid.obstacle_version:
+            self._version = self.grid.obstacle_version
+            blocked = self.obstacle_mask | (self.grid.states[:self.grid.rows, :self.grid.cols] == OBSTACLE)
+            if self._blocked is None or (self._blocked & ~blocked).any():
+                self.cache.clear()
+            else:
+                self._drop_crossing(blocked & ~self._blocked)
+            self._blocked = blocked
+        return self._blocked
+
+    def _drop_crossing(self, new_blocked):
+        '''Drops the cached paths through cells of new_blocked, or cutting their corners'''
+        for key, path in list(self.cache.items()):
+            if path is None or len(path) < 2:
+                continue
+            cells = np.array(path)
+            c, r = cells[:-1, 0], cells[:-1, 1]
+            nc, nr = cells[1:, 0], cells[1:, 1]
+            # cells between start and goal, both are accepted even if blocked
+            crossed = new_blocked[r[1:], c[1:]].any()
+            diagonal = (c != nc) & (r != nr)
+            corners = new_blocked[r[diagonal], nc[diagonal]].any() or new_blocked[nr[diagonal], c[diagonal]].any()
+            if crossed or corners:
+                del self.cache[key]
+
+    def cell_of(self, position):
+        col = min(max(int(position[0] // self.grid.resolution), 0), self.grid.cols - 1)
+        row = min(max(int(position[1] // self.grid.resolution), 0), self.grid.rows - 1)
+        return (col, row)
+
+    def plan(self, start, goal):
+        '''
+            Path between two positions of the world
+
+            start, goal: positions in the world
+            return: list of waypoints (centers of the cells where the path turns) ending at goal,
+                    None if the goal can not be reached
+        '''
+        cells = self.plan_cells(self.cell_of(start), self.cell_of(goal))
+        if cells is None:
+            return None
+        waypoints = [self.grid.get_cell_center(c) for c in self._turns(cells)[1:-1]]
+        waypoints.append(vec2(goal[0], goal[1]))
+        return waypoints
+
+    def plan_cells(self, start, goal):
+        '''
+            Cells of the shortest path between two cells, from the cache when it was planned before.
+            Start and goal are accepted even if blocked, a drone stuck close to an obstacle marks its own cell.
+
+            start, goal: (col, row)
+            return: list of (col, row) from start to goal, None if there is no path
+        '''
+        blocked = self.blocked
+        key = (start, goal)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        path = self._astar(start, goal, blocked)
+        self.cache[key] = path
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return path
+
+    def _astar(self, start, goal, blocked):
+        cols, rows = self.grid.cols, self.grid.rows
+        gc, gr = goal
+
+        def heuristic(c, r):
+            # octile distance
+            dx, dy = abs(c - gc), abs(r - gr)
+            return max(dx, dy) + (SQRT2 - 1) * min(dx, dy)
+
+        cost = {start: 0.0}
+        came_from = {start: None}
+        closed = set()
+        heap = [(heuristic(*start), 0.0, start)]
+        while heap:
+            _, g, cell = heapq.heappop(heap)
+            if cell == goal:
+                path = []
+                while cell is not None:
+                    path.append(cell)
+                    cell = came_from[cell]
+                return path[::-1]
+            if cell in closed:
+                continue
+            closed.add(cell)
+
+            c, r = cell
+            for dc, dr in NEIGHBORS_8:
+                nc, nr = c + dc, r + dr
+                if not (0 <= nc < cols and 0 <= nr < rows):
+                    continue
+                if blocked[nr, nc] and (nc, nr) != goal:
+                    continue
+                # diagonal moves can not cut the corner of a blocked cell
+                if dc and dr and (blocked[r, nc] or blocked[nr, c]):
+                    continue
+                new_cost = g + (SQRT2 if dc and dr else 1.0)
+                neighbor = (nc, nr)
+                if new_cost < cost.get(neighbor, float('inf')):
+                    cost[neighbor] = new_cost
+                    came_from[neighbor] = cell
+                    heapq.heappush(heap, (new_cost + heuristic(nc, nr), new_cost, neighbor))
+        return None
+
+    @staticmethod
+    def _turns(cells):
+        '''Keeps the first and last cells and the cells where the direction of the path changes'''
+        if len(cells) <= 2:
+            return list(cells)
+        turns = [cells[0]]
+        for previous, cell, following in zip(cells, cells[1:], cells[2:]):
+            if (cell[0] - previous[0], cell[1] - previous[1]) != (following[0] - cell[0], following[1] - cell[1]):
+                turns.append(cell)
+        turns.append(cells[-1])
+        return turns
@@ -1,4 +1,5 @@
 import pygame
+import numpy as np
 
 class Rect:
     def __init__(self, x, y, w, h):
@@ -25,25 +26,69 @@ class Quadtree:
         self.capacity = capacity
         self.points = []
         self.divided = False
+        # items of the tree, nodes store their index. Only the root keeps them
+        self.items = []
+
+    def build(self, positions, items=None):
+        '''
+            Clears the tree and inserts all items, same interface as SpatialHash.build
+
+            positions: array (N,2) of positions
+            items: objects stored at the positions, the indices 0..N-1 are used when not given
+        '''
+        self.points = []
+        self.divided = False
+        self.items = list(items) if items is not None else list(range(len(positions)))
+        for i, p in enumerate(positions):
+            self._insert(pygame.math.Vector2(p[0], p[1]), i)
+
+    def query_radius_batch(self, points, radius):
+        '''
+            Finds the items within radius of every point, same interface as SpatialHash.query_radius_batch
+
+            return: (offsets, indices) the items close to point i are
+                    indices[offsets[i]:offsets[i+1]], sorted by distance
+        '''
+        offsets = [0]
+        indices = []
+        for p in points:
+            center = pygame.math.Vector2(p[0], p[1])
+            found = []
+            self._query_points(Rect(center.x, center.y, radius, radius), found)
+            close = sorted((center.distance_squared_to(q), i) for q, i in found
+                           if center.distance_squared_to(q) <= radius * radius)
+            indices += [i for _, i in close]
+            offsets.append(len(indices))
+        return np.array(offsets, dtype=np.intp), np.array(indices, dtype=np.intp)
 
     def insert(self, point, data):
+        '''
+            Inserts a single item after the ones already in the tree, same signature as SpatialHash.insert
+            return: False when the point is outside the boundary and the item was not inserted
+        '''
+        if not self.boundary.contains(point):
+            return False
+        self.items.append(data)
+        return self._insert(point, len(self.items) - 1)
+
+    def _insert(self, point, index):
         if not self.boundary.contains(point):
             return False
 
         if len(self.points) < self.capacity:
-            self.points.append((point, data))
+            self.points.append((point, index))
             return True
         else:
             if not self.divided:
                 self.subdivide()
 
-            if self.northeast.insert(point, data):
+            if self.northeast._insert(point, index):
                 return True
-            elif self.northwest.insert(point, data):
+            elif self.northwest._insert(point, index):
                 return True
-            elif self.southeast.insert(point, data):
+            elif self.southeast._insert(point, index):
                 return True
-            elif self.southwest.insert(point, data):
+            elif self.southwest._insert(point, index):
                 return True
 
     def subdivide(self):
@@ -63,15 +108,30 @@ class Quadtree:
         self.divided = True
 
     def query(self, range, found):
+        points = []
+        self._query_points(range, points)
+        found += [self.items[index] for _, index in points]
+
+    def query_indices(self, range):
+        '''
+            Indices of the items inside range, same interface as SpatialHash.query_indices
+
+            return: sorted array of item indices
+        '''
+        points = []
+        self._query_points(range, points)
+        return np.array(sorted(data for _, data in points), dtype=np.intp)
+
+    def _query_points(self, range, found):
         if not self.boundary.intersects(range):
             return
 
         for p in self.points:
             if range.contains(p[0]):
-                found.append(p[1])
+                found.append(p)
 
         if self.divided:
-            self.northwest.query(range, found)
-            self.northeast.query(range, found)
-            self.southwest.query(range, found)
-            self.southeast.query(range, found)
+            self.northwest._query_points(range, found)
+            self.northeast._query_points(range, found)
+            self.southwest._query_points(range, found)
+            self.southeast._query_points(range, found)
@@ -0,0 +1,211 @@
+import math
+import numpy as np
+import pygame as pg
+
+from constants import WORLD_WIDTH, WORLD_HEIGHT, TRAIL_FADE_ALPHA, TRAIL_FADE_INTERVAL
+
+
+class TrailLayer(object):
+    '''
+        Transparent world-sized surface accumulating the flight path of every drone.
+        Each update draws only the segments recorded since the previous one, read from the
+        track ring buffer of the swarm state, so its cost does not grow with the length of the trails.
+        Trails optionally fade with a multiplication of the alpha of the whole layer every fade_interval updates.
+    '''
+    def __init__(self, fade_alpha=TRAIL_FADE_ALPHA, fade_interval=TRAIL_FADE_INTERVAL, width=1):
+        """
+        Args:
+            fade_alpha: alpha kept out of 255 by each fade pass, 255 never fades
+            fade_interval: updates between fade passes
+            width: width in pixels of the trails
+        """
+        self.fade_alpha = fade_alpha
+        self.fade_interval = max(1, int(fade_interval))
+        self.width = width
+        self.surface = pg.Surface((WORLD_WIDTH, WORLD_HEIGHT), pg.SRCALPHA)
+        # positions of every drone already drawn, see SwarmState.track_count
+        self.drawn = np.zeros(0, dtype=np.intp)
+        self.updates = 0
+
+    def clear(self):
+        '''Erases every trail, needed once per simulation'''
+        self.surface.fill((0, 0, 0, 0))
+        self.drawn = np.zeros(0, dtype=np.intp)
+        self.updates = 0
+
+    def update(self, swarm_manager):
+        '''
+            Draws the segments of the trails recorded since the last update and fades the layer when due
+
+            swarm_manager: SwarmManager with the drones (colors) and their swarm state (tracks)
+            return: list of rects of the world that changed
+        '''
+        state = swarm_manager.state
+        count = min(state.count, len(swarm_manager.swarm))
+        recorded = state.track_count[:count]
+        if len(self.drawn) != count or np.any(recorded < self.drawn):
+            # the swarm was recreated or drones were added, new drones start their trail from the first position
+            drawn = np.zeros(count, dtype=np.intp)
+            kept = min(count, len(self.drawn))
+            drawn[:kept] = np.minimum(self.drawn[:kept], recorded[:kept])
+            self.drawn = drawn
+
+        rects = []
+        for index in np.flatnonzero(recorded > self.drawn).tolist():
+            # the last position drawn is the start of the newest segment
+            points = state.get_track(index, self.drawn[index] - 1)
+            if len(points) >= 2:
+                rects.append(pg.draw.lines(self.surface, swarm_manager.swarm[index].color_target,
+                                           False, points.tolist(), self.width))
+        self.drawn = recorded.copy()
+
+        self.updates += 1
+        if self.fade_alpha < 255 and self.updates % self.fade_interval == 0:
+            self.surface.fill((255, 255, 255, self.fade_alpha), special_flags=pg.BLEND_RGBA_MULT)
+            return [self.surface.get_rect()]
+        return rects
+
+
+class StaticLayerCache(object):
+    '''
+        Pre-renders the parts of the world that do not move during a simulation
+        (background, grid and obstacles) into a single surface.
+        Only the cells of the grid whose state changed are redrawn, the dynamic
+        entities (target and drones) are drawn on top of a copy every frame.
+        Power-of-two downsampled copies of the layer (mipmaps) are kept for zoomed-out views.
+        With a TrailLayer the trails of the drones are composited over the layer.
+    '''
+    def __init__(self, background, min_scale=1.0, trails=None):
+        """
+        Args:
+            background: surface of the size of the world, drawn below everything
+            min_scale: smallest zoom the layer is drawn at, mipmaps are kept down to it
+            trails: TrailLayer drawn over background, grid and obstacles, None draws no trails
+        """
+        self.background = background
+        self.trails = trails
+        # background, grid and obstacles, self.surface is the base with the trails over it
+        self.base = None
+        self.surface = None
+        # levels[k] is the layer downsampled by 2**k, levels[0] is self.surface
+        self.num_levels = 1 + max(0, int(math.floor(math.log2(1 / min_scale) + 1e-9)))
+        self.levels = []
+        # obstacles alone on a transparent surface, restores the sprites over a redrawn cell
+        self.obstacle_layer = None
+        self.grid = None
+        self.obstacles = None
+
+    def is_valid(self, grid, obstacles):
+        return self.surface is not None and grid is self.grid and obstacles is self.obstacles
+
+    def rebuild(self, grid, obstacles):
+        '''
+            Renders the whole static layer, needed once per simulation (new grid and obstacles)
+
+            grid: GridField
+            obstacles: Obstacles
+        '''
+        self.grid = grid
+        self.obstacles = obstacles
+
+        self.obstacle_layer = pg.Surface((WORLD_WIDTH, WORLD_HEIGHT), pg.SRCALPHA)
+        obstacles.draw(self.obstacle_layer)
+
+        self.base = self.background.copy()
+        grid.track_dirty_cells()
+        grid.pop_dirty_cells()
+        grid.draw_all(self.base)
+        self.base.blit(self.obstacle_layer, (0, 0))
+        self.surface = self.base
+        if self.trails is not None:
+            # trails of the previous simulation are erased, the composite starts equal to the base
+            self.trails.clear()
+            self.surface = self.base.copy()
+
+        self.levels = [self.surface]
+        for level in range(1, self.num_levels):
+            factor = 2 ** level
+            self.levels.append(pg.Surface((WORLD_WIDTH // factor, WORLD_HEIGHT // factor)).convert(self.surface))
+        self._update_levels([self.surface.get_rect()])
+
+    def update(self, grid, obstacles, swarm_manager=None):
+        '''
+            Brings the static layer up to date with the grid and the trails of the swarm
+
+            swarm_manager: SwarmManager whose trails are drawn, None leaves the trails as they are
+            return: list of rects of the world that changed
+        '''
+        if not self.is_valid(grid, obstacles):
+            self.rebuild(grid, obstacles)
+            if self.trails is not None and swarm_manager is not None:
+                # the trails were cleared, only the segments drawn now differ from the base
+                rects = self.trails.update(swarm_manager)
+                self._composite(rects)
+                self._update_levels(rects)
+            return [self.surface.get_rect()]
+
+        cols, rows = grid.pop_dirty_cells()
+        rects = grid.draw_cells(self.base, cols, rows)
+        for rect in rects:
+            # obstacles are above the grid
+            self.base.blit(self.obstacle_layer, rect, area=rect)
+        if self.trails is not None:
+            if swarm_manager is not None:
+                rects = rects + self.trails.update(swarm_manager)
+            self._composite(rects)
+        self._update_levels(rects)
+        return rects
+
+    def _composite(self, rects):
+        '''Draws the trails over the base in rects of the layer'''
+        self.surface.blits([(self.base, rect, rect) for rect in rects], doreturn=False)
+        self.surface.blits([(self.trails.surface, rect, rect) for rect in rects], doreturn=False)
+
+    def _update_levels(self, rects):
+        '''Downsamples the rects of the layer into every mipmap level'''
+        for level in range(1, len(self.levels)):
+            factor = 2 ** level
+            target = self.levels[level]
+            bounds = pg.Rect(0, 0, target.get_width() * factor, target.get_height() * factor)
+            for rect in rects:
+                # aligned to blocks of factor x factor pixels, every block becomes one pixel of the level
+                x0 = rect.left // factor * factor
+                y0 = rect.top // factor * factor
+                x1 = -(-rect.right // factor) * factor
+                y1 = -(-rect.bottom // factor) * factor
+                area = pg.Rect(x0, y0, x1 - x0, y1 - y0).clip(bounds)
+                if area.width <= 0 or area.height <= 0:
+                    continue
+                block = pg.transform.smoothscale(self.surface.subsurface(area),
+                                                 (area.width // factor, area.height // factor))
+                target.blit(block, (area.left // factor, area.top // factor))
+
+    def level_for_zoom(self, zoom):
+        '''
+            Level closest to zoom in scale (nearest mipmap)
+            return: (surface, scale of the surface relative to the world)
+        '''
+        level = 0
+        if zoom < 1:
+            level = min(int(round(math.log2(1 / zoom))), len(self.levels) - 1)
+        return self.levels[level], 1 / 2 ** level
+
+    def restore(self, surface, rects):
+        '''
+            Copies only some areas of the static layer to surface, erasing what was drawn over them
+
+            surface: world surface
+            rects: list of rects of the world
+        '''
+        surface.blits([(self.surface, rect, rect) for rect in rects], doreturn=False)
+
+    def draw(self, surface, grid, obstacles):
+        '''
+            Updates the static layer and copies it to surface, the previous frame is overwritten
+
+            surface: world surface
+            grid: GridField
+            obstacles: Obstacles
+        '''
+        self.update(grid, obstacles)
+        surface.blit(self.surface, (0, 0))
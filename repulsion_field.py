@@ -0,0 +1,79 @@
+import numpy as np
+from math import ceil
+from constants import *
+
+
+def analytic_repulsion(points, obstacles, factor=OBSTACLE_REPULSION, max_force=SEEK_FORCE*1.8,
+                       radius=AVOID_OBSTACLES + AVOID_DISTANCE):
+    '''
+        Obstacle repulsion force at every point, the same force Vehicle.collision_avoidance applies:
+        the sum, over obstacles closer than radius, of -limit(derivativeBivariate(obstacle, point) / SAMPLE_TIME, max_force)
+
+        points: array (N,2) of positions
+        obstacles: array (M,2) of obstacle positions
+        return: array (N,2) of forces
+    '''
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    obstacles = np.asarray(obstacles, dtype=float).reshape(-1, 2)
+    force = np.zeros_like(points)
+    for o in obstacles:
+        diff = points - o
+        close = np.einsum('ij,ij->i', diff, diff) < radius * radius
+        if not close.any():
+            continue
+        d = diff[close]
+        # derivative of the bivariate function (see utils.derivativeBivariate)
+        f = np.exp(-factor * d[:, 0] / 10**2 - factor * d[:, 1] / 10**2)
+        g = (f[:, None] * (-2 * factor * d)) / SAMPLE_TIME
+        # limits the magnitude
+        norm = np.sqrt(np.einsum('ij,ij->i', g, g))
+        too_strong = norm > max_force
+        g[too_strong] *= (max_force / norm[too_strong])[:, None]
+        force[close] -= g
+    return force
+
+
+class RepulsionField(object):
+    '''
+        Precomputed raster of the obstacle repulsion force.
+        Obstacles do not move during a simulation, so the force is evaluated once on a grid of nodes
+        spaced by resolution pixels and drones get it by bilinear interpolation.
+    '''
+    def __init__(self, obstacles, resolution=REPULSION_FIELD_RESOLUTION, width=WORLD_WIDTH, height=WORLD_HEIGHT):
+        self.resolution = resolution
+        self.cols = int(ceil(width / resolution)) + 1 # nodes
+        self.rows = int(ceil(height / resolution)) + 1
+        self.obstacles = np.array([(o[0], o[1]) for o in obstacles], dtype=float).reshape(-1, 2)
+        self.force = np.zeros((self.rows, self.cols, 2))
+
+        # evaluates only the nodes around every obstacle
+        radius = AVOID_OBSTACLES + AVOID_DISTANCE
+        reach = int(ceil(radius / resolution))
+        for o in self.obstacles:
+            c = int(round(o[0] / resolution))
+            r = int(round(o[1] / resolution))
+            c0, c1 = max(c - reach, 0), min(c + reach + 1, self.cols)
+            r0, r1 = max(r - reach, 0), min(r + reach + 1, self.rows)
+            if c0 >= c1 or r0 >= r1:
+                continue
+            xs, ys = np.meshgrid(np.arange(c0, c1) * resolution, np.arange(r0, r1) * resolution)
+            nodes = np.stack([xs.ravel(), ys.ravel()], axis=1)
+            self.force[r0:r1, c0:c1] += analytic_repulsion(nodes, o).reshape(r1 - r0, c1 - c0, 2)
+
+    def sample(self, positions):
+        '''
+            Repulsion force at every position by bilinear interpolation
+
+            positions: array (N,2) of positions
+            return: array (N,2) of forces
+        '''
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        fx = np.clip(positions[:, 0] / self.resolution, 0, self.cols - 1)
+        fy = np.clip(positions[:, 1] / self.resolution, 0, self.rows - 1)
+        c0 = np.minimum(fx.astype(np.intp), self.cols - 2)
+        r0 = np.minimum(fy.astype(np.intp), self.rows - 2)
+        tx = (fx - c0)[:, None]
+        ty = (fy - r0)[:, None]
+        top = self.force[r0, c0] * (1 - tx) + self.force[r0, c0 + 1] * tx
+        bottom = self.force[r0 + 1, c0] * (1 - tx) + self.force[r0 + 1, c0 + 1] * tx
+        return top * (1 - ty) + bottom * ty
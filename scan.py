@@ -4,6 +4,11 @@ import pygame
 import math
 import random
 
+import numpy as np
+
+from grid import NOT_VISITED
+from assignment import assign_drones_to_regions
+
 
 class ScanInterface:
     """Base interface for scan algorithms in drone simulations."""
@@ -26,13 +31,77 @@ class ScanInterface:
         pass  # Default implementation does nothing
 
     def scan(self, simulation, list_obst) -> None:
-        """Executes the scan algorithm.
+        """Executes the scan algorithm: updates the swarm, then asks for new targets of the whole swarm
+        with scan_batch, or drone by drone with scan_drone when scan_batch is not implemented.
+        Drones following a planned path are left out, see FollowPathState.
         
         Args:
             simulation: The current simulation
             list_obst: List of obstacles
         """
-        raise NotImplementedError("Subclasses must implement scan()")
+        swarm_manager = simulation.swarm_manager
+        swarm_manager.update(simulation, list_obst, simulation.obstacles)
+
+        state = swarm_manager.state
+        n = state.count
+        # drones following a planned path keep their target until the path ends
+        following = swarm_manager.following_path()
+        targets = self.scan_batch(simulation, state.position[:n], state.velocity[:n], state.target[:n].copy())
+        if targets is None:
+            for drone, follow in zip(simulation.swarm, following):
+                if not follow:
+                    self.scan_drone(simulation, drone)
+        else:
+            state.target[:n] = np.where(following[:, None], state.target[:n], targets)
+
+    def scan_batch(self, simulation, positions, velocities, targets) -> Optional[np.ndarray]:
+        """Optional hook computing the targets of the whole swarm at once.
+        
+        Args:
+            simulation: The current simulation
+            positions: array (N,2) with the position of every drone
+            velocities: array (N,2) with the velocity of every drone, changes are applied to the swarm
+            targets: array (N,2) with the current target of every drone, NaN for drones without target
+            
+        Returns:
+            array (N,2) with the new targets (NaN for no target), None to fall back to scan_drone
+        """
+        return None
+
+    def scan_drone(self, simulation, drone) -> None:
+        """Per-drone fallback of scan_batch, called for every drone.
+        
+        Args:
+            simulation: The current simulation
+            drone: Vehicle to be updated
+        """
+        pass  # Default implementation does nothing
+
+
+def reached_goal_batch(positions, targets):
+    """Drones closer than RADIUS_TARGET to their target, batched version of Vehicle.reached_goal."""
+    gap = targets - positions
+    with np.errstate(invalid='ignore'):
+        return np.einsum('ij,ij->i', gap, gap) <= RADIUS_TARGET * RADIUS_TARGET
+
+
+def random_directions(n):
+    """Array (n,2) of unit vectors in random directions."""
+    angle = np.random.uniform(0, 2 * math.pi, n)
+    return np.stack([np.cos(angle), np.sin(angle)], axis=1)
+
+
+def spread_over_regions(simulation) -> None:
+    """Divides the grid in one balanced region per drone, assigned by distance,
+    and sends every drone to the start cell of its region."""
+    positions = [(drone.location.x, drone.location.y) for drone in simulation.swarm]
+    regions = assign_drones_to_regions(simulation.grid_field, positions, simulation.list_obst)
+
+    for drone, region in zip(simulation.swarm, regions):
+        # Set initial target in the start cell of the region
+        c, r = region.start
+        drone.set_target(simulation.grid_field.get_cell_center((c, r)))
+        drone.set_position_in_grid(c, r)
 
 
 class DefineTargetScan(ScanInterface):
@@ -43,15 +112,9 @@ class DefineTargetScan(ScanInterface):
     def to_string(self) -> str:
         return 'DefineTargetScan'
 
-    def scan(self, simulation, list_obst) -> None:
-        """Execute the standard target scan.
-        
-        Args:
-            simulation: The current simulation
-            list_obst: List of obstacles
-        """
-        # Delegate the update loop to the swarm manager
-        simulation.swarm_manager.update(simulation, list_obst)
+    def scan_batch(self, simulation, positions, velocities, targets) -> np.ndarray:
+        """Drones keep the target, the update loop is done by the swarm manager."""
+        return targets
 
 
 class RowScan(ScanInterface):
@@ -69,15 +132,9 @@ class RowScan(ScanInterface):
         """
         simulation.set_target_using_search_pattern(target)
 
-    def scan(self, simulation, list_obst) -> None:
-        """Execute the row scanning algorithm.
-        
-        Args:
-            simulation: The current simulation
-            list_obst: List of obstacles
-        """
-        # Delegate the update loop to the swarm manager
-        simulation.swarm_manager.update(simulation, list_obst)
+    def scan_batch(self, simulation, positions, velocities, targets) -> np.ndarray:
+        """Drones follow their search state machine, the update loop is done by the swarm manager."""
+        return targets
 
     def define_search_area(self) -> None:
         """Define the area to be searched."""
@@ -90,23 +147,11 @@ class RandoWalkScan(ScanInterface):
     def to_string(self) -> str:
         return 'RandoWalkScan'
 
-    def scan(self, simulation, list_obst) -> None:
-        """Execute the random walk scanning algorithm.
-        
-        Args:
-            simulation: The current simulation
-            list_obst: List of obstacles
-        """
-        simulation.swarm_manager.update(simulation, list_obst)
-
-        for drone in simulation.swarm:
-            if drone.reached_goal(drone.target) or drone.target is None:
-                # Generate new random target
-                new_target = pygame.math.Vector2(
-                    random.uniform(0, WORLD_WIDTH),
-                    random.uniform(0, WORLD_HEIGHT)
-                )
-                drone.set_target(new_target)
+    def scan_batch(self, simulation, positions, velocities, targets) -> np.ndarray:
+        """New random target for drones without target or that reached it."""
+        new = np.isnan(targets[:, 0]) | reached_goal_batch(positions, targets)
+        targets[new] = np.random.uniform((0, 0), (WORLD_WIDTH, WORLD_HEIGHT), (int(new.sum()), 2))
+        return targets
 
 
 class SnookerScan(ScanInterface):
@@ -123,49 +168,31 @@ class SnookerScan(ScanInterface):
             direction = pygame.math.Vector2(math.cos(angle), math.sin(angle))
             drone.set_target(drone.location + direction * 1000)
 
-    def scan(self, simulation, list_obst) -> None:
-        """Execute the snooker scanning algorithm.
-        
-        Args:
-            simulation: The current simulation
-            list_obst: List of obstacles
-        """
-        simulation.swarm_manager.update(simulation, list_obst)
-
+    def scan_batch(self, simulation, positions, velocities, targets) -> np.ndarray:
+        """Reflects the velocity of drones moving against the walls and keeps a far target ahead of every drone."""
         margin = SIZE_DRONE * 2
         
-        for drone in simulation.swarm:
-            pos = drone.location
-            vel = drone.velocity
-            bounce = False
-            
-            # Check horizontal walls
-            if (pos.x < margin and vel.x < 0) or (pos.x > WORLD_WIDTH - margin and vel.x > 0):
-                vel.x *= -1
-                bounce = True
-                
-            # Check vertical walls
-            if (pos.y < margin and vel.y < 0) or (pos.y > WORLD_HEIGHT - margin and vel.y > 0):
-                vel.y *= -1
-                bounce = True
-            
-            if bounce:
-                # Update velocity and set new target in the reflected direction
-                drone.velocity = vel
-                if vel.length() > 0:
-                    direction = vel.normalize()
-                    drone.set_target(pos + direction * 1000)
-            
-            # If drone reached the "far" target without bouncing (e.g. large arena), keep going
-            if drone.reached_goal(drone.target):
-                if drone.velocity.length() > 0.1:
-                    direction = drone.velocity.normalize()
-                    drone.set_target(pos + direction * 1000)
-                else:
-                    # If stopped, pick random direction
-                    angle = random.uniform(0, 2 * math.pi)
-                    direction = pygame.math.Vector2(math.cos(angle), math.sin(angle))
-                    drone.set_target(pos + direction * 1000)
+        # Check horizontal and vertical walls
+        bounce_x = ((positions[:, 0] < margin) & (velocities[:, 0] < 0)) | \
+                   ((positions[:, 0] > WORLD_WIDTH - margin) & (velocities[:, 0] > 0))
+        bounce_y = ((positions[:, 1] < margin) & (velocities[:, 1] < 0)) | \
+                   ((positions[:, 1] > WORLD_HEIGHT - margin) & (velocities[:, 1] > 0))
+        velocities[bounce_x, 0] *= -1
+        velocities[bounce_y, 1] *= -1
+        
+        # New target in the reflected direction
+        speed = np.sqrt(np.einsum('ij,ij->i', velocities, velocities))
+        bounce = (bounce_x | bounce_y) & (speed > 0)
+        targets[bounce] = positions[bounce] + velocities[bounce] / speed[bounce, None] * 1000
+        
+        # If drone reached the "far" target without bouncing (e.g. large arena), keep going
+        reached = reached_goal_batch(positions, targets)
+        moving = reached & (speed > 0.1)
+        targets[moving] = positions[moving] + velocities[moving] / speed[moving, None] * 1000
+        # If stopped, pick random direction
+        stopped = reached & ~moving
+        targets[stopped] = positions[stopped] + random_directions(int(stopped.sum())) * 1000
+        return targets
 
 
 class MeshScan(ScanInterface):
@@ -176,76 +203,147 @@ class MeshScan(ScanInterface):
 
     def prepare_simulation(self, simulation, target) -> None:
         """Set up the simulation for mesh scanning."""
-        # Divide the grid among drones
-        num_drones = len(simulation.swarm)
-        rows = simulation.grid_field.rows
-        cols = simulation.grid_field.cols
+        # Divide the grid among drones: one balanced region per drone, assigned by distance
+        spread_over_regions(simulation)
+
+    def scan_batch(self, simulation, positions, velocities, targets) -> np.ndarray:
+        """Drones that reached their cell move to a random unvisited neighbor cell,
+        or to the closest unvisited cell when every neighbor was visited."""
+        grid = simulation.grid_field
+        reached = np.flatnonzero(reached_goal_batch(positions, targets))
+        if len(reached) == 0:
+            return targets
         
-        # Calculate grid dimensions for drone assignment (e.g., 2x2 for 4 drones)
-        grid_dim = int(math.ceil(math.sqrt(num_drones)))
-        step_x = cols // grid_dim
-        step_y = rows // grid_dim
+        # Get current grid position and neighbors (cols, rows) of every drone
+        cols, rows = grid.get_cell_of_positions(positions[reached])
+        offsets = np.array([(dx, dy) for dx in range(-1, 2) for dy in range(-1, 2) if dx != 0 or dy != 0])
+        neighbor_cols = cols[:, None] + offsets[:, 0]
+        neighbor_rows = rows[:, None] + offsets[:, 1]
+        inside = (neighbor_cols >= 0) & (neighbor_cols < grid.cols) & (neighbor_rows >= 0) & (neighbor_rows < grid.rows)
+        unvisited = inside & (grid.get_state_cells(neighbor_cols, neighbor_rows) == NOT_VISITED)
         
-        for i, drone in enumerate(simulation.swarm):
-            # Determine starting cell for this drone
-            r = (i // grid_dim) * step_y + step_y // 2
-            c = (i % grid_dim) * step_x + step_x // 2
-            
-            # Ensure within bounds
-            r = min(r, rows - 1)
-            c = min(c, cols - 1)
-            
-            # Set initial target
-            cell_center = simulation.grid_field.cells[r][c].get_cell_center()
-            target_pos = pygame.math.Vector2(cell_center[0], cell_center[1])
-            drone.set_target(target_pos)
-            drone.set_position_in_grid(c, r)
+        # Pick a random unvisited neighbor, or any random neighbor
+        candidates = np.where(unvisited.any(axis=1)[:, None], unvisited, inside)
+        choice = np.argmax(np.random.uniform(0.1, 1, candidates.shape) * candidates, axis=1)
+        pick = np.arange(len(reached))
+        targets[reached] = grid.get_cell_centers(neighbor_cols[pick, choice], neighbor_rows[pick, choice])
+        
+        # If all visited, go to the closest cell not visited yet
+        lost = reached[~unvisited.any(axis=1)]
+        for index, nearest in zip(lost, grid.get_nearest_unvisited_batch(positions[lost])):
+            if nearest:
+                targets[index] = grid.get_cell_centers(*nearest[0])
+        
+        # Fallback to random position if stuck
+        stuck = ~inside.any(axis=1)
+        targets[reached[stuck]] = np.random.uniform((0, 0), (WORLD_WIDTH, WORLD_HEIGHT), (int(stuck.sum()), 2))
+        return targets
 
-    def scan(self, simulation, list_obst) -> None:
-        """Execute the mesh scanning algorithm.
+
+class FrontierScan(ScanInterface):
+    """Frontier-based exploration: drones head to the frontier between visited and unvisited cells.
+    Every drone that needs a target picks the frontier region with the best size / distance ratio,
+    regions already chosen by other drones are less attractive.
+    """
+
+    def __init__(self):
+        self.targets = np.zeros((0, 2)) # current frontier target of every drone, NaN for none
+
+    def to_string(self) -> str:
+        return 'FrontierScan'
+
+    def prepare_simulation(self, simulation, target) -> None:
+        """Set up the simulation for frontier scanning: drones spread over the map first, as in MeshScan,
+        so every one of them opens its own frontier."""
+        spread_over_regions(simulation)
+        state = simulation.swarm_manager.state
+        self.targets = state.target[:state.count].copy()
+
+    def scan_batch(self, simulation, positions, velocities, targets) -> np.ndarray:
+        """Drones without frontier target, close to it or whose target was already visited by the swarm
+        get a new one."""
+        grid = simulation.grid_field
+
+        if len(self.targets) < len(positions):
+            missing = np.full((len(positions) - len(self.targets), 2), np.nan)
+            self.targets = np.vstack([self.targets, missing])
+
+        known = ~np.isnan(self.targets[:, 0])
+        cols, rows = grid.get_cell_of_positions(np.where(known[:, None], self.targets, 0))
+        waiting = ~known | reached_goal_batch(positions, self.targets) | (grid.get_state_cells(cols, rows) != NOT_VISITED)
+
+        if waiting.any():
+            self.assign_targets(simulation, positions, np.flatnonzero(waiting))
+            targets[waiting] = self.targets[waiting]
+        return targets
+
+    def assign_targets(self, simulation, positions, drone_indices) -> None:
+        """Sends every drone in drone_indices to a frontier region.
         
         Args:
             simulation: The current simulation
-            list_obst: List of obstacles
+            positions: array (N,2) with the position of every drone
+            drone_indices: index of the drones that need a new target
         """
-        simulation.swarm_manager.update(simulation, list_obst)
-        
-        for drone in simulation.swarm:
-            if drone.reached_goal(drone.target):
-                # Get current grid position
-                col, row = drone.get_position_in_grid()
-                
-                # Find neighbors (indices)
-                neighbors = []
-                for dx in range(-1, 2):
-                    for dy in range(-1, 2):
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = col + dx, row + dy
-                        if 0 <= nx < simulation.grid_field.cols and 0 <= ny < simulation.grid_field.rows:
-                            neighbors.append((nx, ny))
-                
-                # Filter for unvisited neighbors
-                unvisited = [n for n in neighbors if simulation.grid_field.cells[n[1]][n[0]].state == 0] # 0 is NOT_VISITED
-                
-                next_target_pos = None
-                
-                if unvisited:
-                    # Pick a random unvisited neighbor
-                    next_cell = random.choice(unvisited)
-                    cell_center = simulation.grid_field.cells[next_cell[1]][next_cell[0]].get_cell_center()
-                    next_target_pos = pygame.math.Vector2(cell_center[0], cell_center[1])
-                elif neighbors:
-                    # If all visited, pick any random neighbor to keep moving
-                    next_cell = random.choice(neighbors)
-                    cell_center = simulation.grid_field.cells[next_cell[1]][next_cell[0]].get_cell_center()
-                    next_target_pos = pygame.math.Vector2(cell_center[0], cell_center[1])
-                else:
-                    # Fallback to random position if stuck
-                    next_target_pos = pygame.math.Vector2(
-                        random.uniform(0, WORLD_WIDTH),
-                        random.uniform(0, WORLD_HEIGHT)
-                    )
-                
-                if next_target_pos:
-                    drone.set_target(next_target_pos)
\ No newline at end of file
+        grid = simulation.grid_field
+        regions = grid.get_frontier_regions()
+
+        if not regions:
+            # nothing visited yet or everything visited: closest unvisited cell
+            for index, nearest in zip(drone_indices, grid.get_nearest_unvisited_batch(positions[drone_indices])):
+                if nearest:
+                    self.targets[index] = grid.get_cell_centers(*nearest[0])
+            return
+
+        # drones already heading to every region
+        claims = np.zeros(len(regions))
+        busy = np.ones(len(positions), dtype=bool)
+        busy[drone_indices] = False
+        busy &= ~np.isnan(self.targets[:, 0])
+        if busy.any():
+            cols, rows = grid.get_cell_of_positions(self.targets[busy])
+            region_of = grid.get_frontier_region_of(cols, rows)
+            np.add.at(claims, region_of[region_of >= 0], 1)
+
+        sizes = np.array([region.size for region in regions], dtype=float)
+        centroids = np.array([(region.centroid.x, region.centroid.y) for region in regions])
+
+        # cells of every region close to the target of every drone (NaN targets are close to none),
+        # the column of a drone is updated when it gets a new target
+        centers = grid.get_cell_centers(np.concatenate([region.cols for region in regions]),
+                                        np.concatenate([region.rows for region in regions]))
+        bounds = np.concatenate([[0], np.cumsum([region.size for region in regions])])
+        dx = centers[:, 0, None] - self.targets[None, :, 0]
+        dy = centers[:, 1, None] - self.targets[None, :, 1]
+        with np.errstate(invalid='ignore'):
+            near = dx * dx + dy * dy < (2 * RADIUS_TARGET) ** 2
+
+        for index in drone_indices:
+            position = positions[index]
+            distance = np.linalg.norm(centroids - position, axis=1) / grid.resolution
+            score = sizes / (1 + distance) / (1 + claims)
+            r = int(np.argmax(score))
+            claims[r] += 1
+
+            # closest cell of the region, away from the targets of the other drones
+            cells = slice(bounds[r], bounds[r + 1])
+            dist2 = np.einsum('ij,ij->i', centers[cells] - position, centers[cells] - position)
+            taken = near[cells, :index].any(axis=1) | near[cells, index + 1:].any(axis=1)
+            if not taken.all():
+                dist2[taken] = np.inf
+            closest = int(np.argmin(dist2))
+            self.targets[index] = centers[cells][closest]
+
+            gap = centers - self.targets[index]
+            near[:, index] = np.einsum('ij,ij->i', gap, gap) < (2 * RADIUS_TARGET) ** 2
+
+
+# Scan algorithms by name, used to select them from the command line
+SCAN_ALGORITHMS = {
+    'DefineTargetScan': DefineTargetScan,
+    'RowScan': RowScan,
+    'RandoWalkScan': RandoWalkScan,
+    'SnookerScan': SnookerScan,
+    'MeshScan': MeshScan,
+    'FrontierScan': FrontierScan,
+}
@@ -0,0 +1,40 @@
+import pygame as pg
+
+from constants import WORLD_WIDTH, WORLD_HEIGHT, TRAILS
+from display_manager import BACKGROUND_COLOR
+
+GROUND_COLOR = (58, 74, 48) # the world, the background texture is not used
+
+
+class ScreenRenderer(object):
+    '''
+        Draws the simulation straight on the screen at the zoom and offset of a DisplayManager,
+        transforming world coordinates instead of scaling a world-sized surface.
+        Every frame is drawn whole, its cost depends on what is visible and not on the size of the world.
+    '''
+    def __init__(self, display_manager):
+        self.display_manager = display_manager
+
+    def draw(self, simulation):
+        '''
+            Draws grid, obstacles, trails, target and drones on the screen
+
+            return: list of rects of the screen drawn (the whole screen)
+        '''
+        dm = self.display_manager
+        screen = dm.screen
+        visible = dm.visible_world_rect()
+
+        screen.fill(BACKGROUND_COLOR)
+        screen.fill(GROUND_COLOR, dm.world_rect_to_screen(pg.Rect(0, 0, WORLD_WIDTH, WORLD_HEIGHT)))
+        simulation.grid_field.draw(screen, visible, dm)
+        simulation.draw_obstacles(screen, visible, dm)
+        if TRAILS:
+            # recent part of the tracks from the ring buffer, the trail layer is world-sized
+            simulation.swarm_manager.draw_tracks(screen, dm)
+        simulation.draw_target(screen, visible, dm)
+        simulation.swarm_manager.draw(screen, visible, dm)
+        # the world surface and the screen drawn from it are now out of date
+        simulation.invalidate_drawing()
+        dm.presented_view = None
+        return [dm.screen_rect]
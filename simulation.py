@@ -1,6 +1,5 @@
-import time
 import pygame
-import math
+import random
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -12,6 +11,8 @@ from random import uniform
 from obstacle import Obstacles
 from utils import Npc_target
 from grid import GridField
+from assignment import assign_drones_to_regions
+from path_planner import PathPlanner
 
 # New Managers
 from experiment_manager import ExperimentManager
@@ -20,25 +21,52 @@ from swarm_manager import SwarmManager
 
 vec2 = pygame.math.Vector2
 
+
+def obstacle_generation(experiment_manager: ExperimentManager, repetition: int) -> int:
+    '''
+        Layout of the obstacles (Obstacles.times_generated) used by simulation repetition of the plan
+        when it is executed in sequence: layouts 1, 2, ... for the repetitions of the first swarm size,
+        then the sequence restarts and layout 1 is used for the others
+    '''
+    num_repet = experiment_manager.in_repetitions / len(experiment_manager.in_num_swarm)
+    if repetition > num_repet - 1:
+        return 1
+    return repetition + 1
+
+
 class Simulation(object):
     
-    def __init__(self, display_manager: DisplayManager, experiment_manager: ExperimentManager):
+    def __init__(self, display_manager: DisplayManager, experiment_manager: ExperimentManager, seed=0,
+                 run_seed=None, obstacle_generation=1):
+        """
+            display_manager: DisplayManager used to draw, None runs the simulation headless
+            experiment_manager: plan of simulations to be executed
+            seed: seed of the obstacles generator
+            run_seed: every simulation seeds random and np.random with run_seed + its repetition,
+                      None keeps the global generators as they are
+            obstacle_generation: layout of the obstacles of the first simulation, see obstacle_generation
+        """
         self.target_simulation = None
         self.display_manager = display_manager
         self.experiment_manager = experiment_manager
         
+        # every time is measured in simulated seconds, counted by SAMPLE_TIME per step
         self.start_watch = 0
         self.stop_watch = 0
         self.time_executing = 0 
+        self.time_target = None # time the target was first found in current simulation
         self.found = False
         
         # variables for obstacles
-        self.obstacles = Obstacles(experiment_manager.in_num_obstacles[0], (WORLD_WIDTH,WORLD_HEIGHT))
+        self.obstacles = Obstacles(experiment_manager.in_num_obstacles[0], (WORLD_WIDTH,WORLD_HEIGHT), seed)
+        self.obstacles.reset_seed(obstacle_generation - 1)
         self.list_obst = []
+        self.run_seed = run_seed
         self.generate_obstacles()
 
         # Grid
         self.grid_field = GridField(RESOLUTION)
+        self.path_planner = None # created for the grid and obstacles of every simulation
 
         # Swarm Manager
         self.swarm_manager = SwarmManager(display_manager)
@@ -46,17 +74,21 @@ class Simulation(object):
         # Current simulations 
         self.targets_search = [] # memory of targets used in simulations
 
-        # npc target 
-        self.npc = Npc_target()
-        self.all_sprites = pygame.sprite.Group()
-        self.all_sprites.add(self.npc)
+        # npc target, sprite is loaded on first draw
+        self.npc = None
+        self.all_sprites = None
 
-        # Create initial swarm
-        self.swarm_manager.create_swarm(experiment_manager.in_num_swarm[0])
+        # StaticLayerCache with background, grid and obstacles, None draws every layer each frame
+        self.static_layer = None
+        # rects covered by the target and drones in the last frame drawn on the world surface
+        self.dynamic_rects = []
+        # rects of the screen covered by them in the last frame drawn by draw_zoomed_out, None in world mode
+        self.screen_rects = None
+        # the world surface missed changes while the screen was drawn without it, restored whole on next draw
+        self.world_surface_stale = True
 
-        # target 
-        self.target_simulation = self.generate_new_random_target()
-        self.targets_search.append(self.target_simulation)
+        # Create initial swarm and target
+        self.start_simulation()
 
     @property
     def swarm(self):
@@ -86,12 +118,15 @@ class Simulation(object):
         self.swarm_manager.set_target(target, found)
 
     def set_time_target(self):
-        self.experiment_manager.set_time_target(time.time() - self.start_watch)
+        # only the first time the target is found counts
+        if self.time_target is None:
+            self.time_target = self.time_executing - self.start_watch
 
     def set_target_using_search_pattern(self, target_simulation):
         '''
-            IN TEST
-            Set target area to be search  
+            Set target area to be search:
+            the grid is split in one balanced region per drone, regions are assigned 
+            minimizing the total distance of the drones to them and every drone starts in its region
         '''
         # saves global target
         self.target_simulation = target_simulation
@@ -101,80 +136,136 @@ class Simulation(object):
         row = self.grid_field.rows
 
         table_search = np.zeros((row,col))
-        num_drones = len(self.swarm)
+        positions = [(d.location.x, d.location.y) for d in self.swarm]
+        regions = assign_drones_to_regions(self.grid_field, positions, self.list_obst)
 
-        step = math.ceil(row/num_drones)
-        r=0
-        c=0
-        col_ = col 
-
-        while num_drones > 0 :
-            # self.swarm.set_target() - argumento é o target referente a celular
+        for index, region in enumerate(regions):
             # pegar a posicao do centro da celula
-            cell_center = self.grid_field.cells[r][c].get_cell_center()
-            drone_target =  vec2(  cell_center[0], cell_center[1] )
-            self.swarm[num_drones-1].set_target( drone_target ) 
-            self.swarm[num_drones-1].mission_target = vec2(  drone_target )
-            
-            #print(f'drone: {num_drones} celula: {(r,c,step)} {vec2(  cell_center[0], cell_center[1] )}')
-
-            table_search[r][c]  = num_drones
-            num_drones -= 1
+            c, r = region.start
+            drone_target = self.grid_field.get_cell_center((c, r))
+            self.swarm[index].set_target( drone_target ) 
+            self.swarm[index].mission_target = vec2(  drone_target )
             
-            # verifica se o passo não vai passar o limite de linhas da matriz
-            if r < row - step:
-                r += step
-            else:
-                r = 0 
-                col_ = math.floor(col_/2)
-                c+= col_
+            table_search[r][c] = index + 1
                 
         #print(table_search)
         self.table_search = table_search
       
-    def draw_obstacles(self):
+    def draw_obstacles(self, surface, visible=None, view=None):
         # draws the sprites of tree
-        for _ in self.list_obst: 
-            self.obstacles.all_sprites.draw(self.display_manager.world_surface)
-            self.obstacles.all_sprites.update(_,0)
-            pygame.draw.circle(self.display_manager.world_surface,(200, 200, 200), _, radius=RADIUS_OBSTACLES, width=1)
-            pygame.draw.circle(self.display_manager.world_surface,(200, 200, 200), _, radius=RADIUS_OBSTACLES*1.6 + AVOID_DISTANCE, width=1)
-
-    def draw_target(self):
-        # draw target - npc
+        self.obstacles.draw(surface, visible, view)
+
+    def draw_target(self, surface, visible=None, view=None):
+        # draw target - npc, returns the rects drawn
+        # view: DisplayManager to draw on the screen, None draws in world coordinates
         if self.target_simulation: 
-            self.all_sprites.draw(self.display_manager.world_surface)
-            self.all_sprites.update(self.target_simulation,0)
-            pygame.draw.circle(self.display_manager.world_surface, LIGHT_BLUE, self.target_simulation, RADIUS_TARGET, 2)
-
-    def draw(self):
-        #draw grid of visited celss
-        self.grid_field.draw(self.display_manager.world_surface)
-        # draw target - npc
-        self.draw_target()
-        # draw obstacles
-        self.draw_obstacles()
+            if visible is not None and not visible.colliderect(
+                    pygame.Rect(self.target_simulation[0] - RADIUS_TARGET, self.target_simulation[1] - RADIUS_TARGET,
+                                2 * RADIUS_TARGET, 2 * RADIUS_TARGET)):
+                return []
+            if self.all_sprites is None:
+                self.npc = Npc_target()
+                self.all_sprites = pygame.sprite.Group()
+                self.all_sprites.add(self.npc)
+            position, radius = vec2(self.target_simulation), RADIUS_TARGET
+            if view is not None:
+                position, radius = view.world_to_screen(position), view.scale_length(RADIUS_TARGET)
+            self.all_sprites.update(position,0)
+            self.all_sprites.draw(surface)
+            circle = pygame.draw.circle(surface, LIGHT_BLUE, position, radius, 2)
+            return [self.npc.rect.union(circle)]
+        return []
+
+    def draw(self, surface=None):
+        '''
+            Draws grid, target, obstacles and swarm. 
+            Never called when running headless, the simulation step does not draw
 
-    def run_simulation(self):
-        # draw grid of visited cels, target and obstacles
-        self.draw()
+            return: list of rects of the surface that changed since the previous call
+        '''
+        if surface is None:
+            surface = self.display_manager.world_surface
+        # entities outside the area of the world on screen are not drawn
+        visible = self.display_manager.visible_world_rect() if self.display_manager else None
+        if self.static_layer is not None:
+            # background, grid and obstacles are cached, only the changed cells
+            # and the areas covered by dynamic entities in the previous frame are restored.
+            # The static layer is kept whole, panning never needs to render it again
+            dirty = self.static_layer.update(self.grid_field, self.obstacles, self.swarm_manager) + self.dynamic_rects
+            if self.world_surface_stale:
+                # the cells changed while the screen was drawn without the world surface are missing
+                self.world_surface_stale = False
+                dirty = [surface.get_rect()]
+            self.screen_rects = None
+            self.static_layer.restore(surface, dirty)
+            dynamic = self.draw_target(surface, visible)
+        else:
+            dirty = [surface.get_rect()]
+            #draw grid of visited celss
+            self.grid_field.draw(surface, visible)
+            # draw target - npc
+            dynamic = self.draw_target(surface, visible)
+            # draw obstacles
+            self.draw_obstacles(surface, visible)
+            # draw the recent track of every drone, there is no trail layer keeping them
+            if TRAILS:
+                self.swarm_manager.draw_tracks(surface)
+        # draw drones
+        dynamic += self.swarm_manager.draw(surface, visible)
+        self.dynamic_rects = dynamic
+        return dirty + dynamic
+
+    def draw_zoomed_out(self, view, restore=(), full=False):
+        '''
+            Draws straight on the screen when zoomed out: the static layer is sampled from its closest
+            mipmap level and the target and drones are drawn at screen resolution.
+            The world surface is not used, only the rects that changed are redrawn.
+
+            view: DisplayManager with the screen, zoom and offset
+            restore: rects of the screen to be redrawn besides the ones changed by the simulation (UI)
+            full: redraws the whole screen
+            return: list of rects of the screen that changed
+        '''
+        changed = self.static_layer.update(self.grid_field, self.obstacles, self.swarm_manager)
+        self.world_surface_stale = True
+        if full or self.screen_rects is None:
+            dirty = [view.screen_rect]
+        else:
+            dirty = [view.world_rect_to_screen(r) for r in changed] + self.screen_rects + list(restore)
+        level, scale = self.static_layer.level_for_zoom(view.zoom_level)
+        view.draw_world_rects(level, dirty, scale)
+
+        visible = view.visible_world_rect()
+        dynamic = self.draw_target(view.screen, visible, view)
+        dynamic += self.swarm_manager.draw(view.screen, visible, view)
+        self.screen_rects = dynamic
+        return dirty + dynamic
+
+    def invalidate_drawing(self):
+        '''Next frame is drawn whole, after the screen was drawn by another renderer'''
+        self.world_surface_stale = True
+        self.screen_rects = None
 
+    def run_simulation(self):
+        '''
+            Executes one step of the simulation: physics, grid and state machines.
+            return: False when all the simulations planned were executed
+        '''
         # Target is Found: pass it to all drones
         if self.found:
             self.set_target(self.target_simulation, found = True)
 
-        if self.start_watch == 0:
-            self.start_watch = time.time()
-
         # for every drone, it will update the collision avoidace, aling the direction and draw current position in simuation
         # The scan method now delegates to swarm_manager.update()
         self.experiment_manager.in_algorithms[self.experiment_manager.current_repetition].scan(self, self.list_obst)
        
         self.time_executing += SAMPLE_TIME # count time of execution based on the sampling
+        self.grid_field.record_coverage(self.time_executing - self.start_watch)
 
         # check completition of simulation
         if self.completed_simulation() >= 0.8 and self.stop_watch == 0 or self.time_executing > TIME_MAX_SIMULATION:
-            self.stop_watch = time.time()
+            self.stop_watch = self.time_executing
+            self.record_result()
             
             if self.experiment_manager and self.experiment_manager.next_simulation():
                 self.rest_simulation()
@@ -183,6 +274,19 @@ class Simulation(object):
 
         return True
 
+    def record_result(self):
+        '''
+            Stores the outputs of the current simulation in the experiment manager
+        '''
+        time = self.stop_watch - self.start_watch
+        if self.time_executing > TIME_MAX_SIMULATION:
+            time = "Goal not reached"
+        time_target = self.time_target if self.time_target is not None else "Target not found"
+        # last sample of the coverage curve at the end of the simulation
+        self.grid_field.record_coverage(self.stop_watch - self.start_watch, force=True)
+        self.experiment_manager.set_time_target(time_target)
+        self.experiment_manager.set_out(time, self.completed_simulation(), self.grid_field.coverage_curve)
+
     def completed_simulation(self):
         count_completed = 0
 
@@ -227,30 +331,39 @@ class Simulation(object):
         # new obstacles
         self.obstacles.num_of_obstacles = self.experiment_manager.in_num_obstacles[self.experiment_manager.current_repetition]
         # Repeat scenario for new number of drones
-        num_repet = self.experiment_manager.in_repetitions / len(self.experiment_manager.in_num_swarm)
-        if self.experiment_manager.current_repetition > num_repet -1:
-            self.obstacles.reset_seed()
-
+        self.obstacles.reset_seed(obstacle_generation(self.experiment_manager, self.experiment_manager.current_repetition) - 1)
         self.generate_obstacles()
-
-        time = self.stop_watch - self.start_watch
-        if self.time_executing > TIME_MAX_SIMULATION:
-            time = "Goal not reached"
-        self.experiment_manager.set_out(time, self.completed_simulation())
             
         # Clear swarm via manager
         self.swarm_manager.swarm = []
-        
+        self.target_simulation = None
+
+        self.start_simulation()
+
+    def start_simulation(self):
+        '''
+            Creates swarm and target of the current simulation of the plan 
+            and prepares its search pattern
+        '''
         self.start_watch = 0
         self.stop_watch = 0
-        self.target_simulation = None
-        serch_patter_for_iteration = self.experiment_manager.in_algorithms[self.experiment_manager.current_repetition].to_string()
+        self.time_executing = 0 # Reset timer
+        self.time_target = None
+
+        if self.run_seed is not None:
+            # swarm, target and behaviors of the simulation do not depend on the ones executed before it
+            random.seed(self.run_seed + self.experiment_manager.current_repetition)
+            np.random.seed(self.run_seed + self.experiment_manager.current_repetition)
+
+        # path planner over the grid and obstacles of this simulation
+        self.path_planner = PathPlanner(self.grid_field, self.list_obst)
+
+        algorithm = self.experiment_manager.in_algorithms[self.experiment_manager.current_repetition]
+        serch_patter_for_iteration = algorithm.to_string()
         print(f'ITERATION USING: {serch_patter_for_iteration} ')
         
         # Recreate swarm
         self.swarm_manager.create_swarm(self.experiment_manager.in_num_swarm[self.experiment_manager.current_repetition], serch_patter_for_iteration)
-        
-        self.time_executing = 0 # Reset timer
 
         # set new random target for iteration
         target = self.generate_new_random_target()
@@ -258,5 +371,5 @@ class Simulation(object):
         self.set_target(target)
 
         # Prepare ALGORITHM TO SEARCH PATTERN
-        self.experiment_manager.in_algorithms[self.experiment_manager.current_repetition].prepare_simulation(self, target)
+        algorithm.prepare_simulation(self, target)
         self.found = False
\ No newline at end of file
@@ -0,0 +1,161 @@
+import numpy as np
+from math import ceil
+
+
+class SpatialHash:
+    '''
+        Flat spatial hash: a uniform grid of buckets of size cell_size covering the world.
+        Rebuilt in O(N) with array operations and answers radius queries for many points at once.
+        Offers the same interface as Quadtree (build, insert, query, query_radius_batch)
+        so both can be swapped and benchmarked.
+    '''
+    def __init__(self, cell_size, width, height):
+        self.cell_size = cell_size
+        self.cols = max(1, int(ceil(width / cell_size)))
+        self.rows = max(1, int(ceil(height / cell_size)))
+        self.num_cells = self.cols * self.rows
+        # stable sort of 16 bit keys is a radix sort, O(N)
+        self._key_type = np.uint16 if self.num_cells <= np.iinfo(np.uint16).max else np.int64
+
+        self.positions = np.zeros((0, 2))
+        self.items = []
+        self.order = np.zeros(0, dtype=np.intp) # item indices sorted by bucket
+        self.cell_start = np.zeros(self.num_cells + 1, dtype=np.intp) # first entry of every bucket in order
+        self._pending = [] # points inserted one at a time, indexed on next query
+
+    def _cell_coords(self, points):
+        cells = np.floor(points / self.cell_size).astype(np.intp)
+        # points outside the world are kept in the border buckets
+        np.clip(cells[:, 0], 0, self.cols - 1, out=cells[:, 0])
+        np.clip(cells[:, 1], 0, self.rows - 1, out=cells[:, 1])
+        return cells[:, 0], cells[:, 1]
+
+    def build(self, positions, items=None):
+        '''
+            Indexes all items at once
+
+            positions: array (N,2) of positions
+            items: objects stored at the positions, the indices 0..N-1 are used when not given
+        '''
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        self.items = list(items) if items is not None else list(range(len(self.positions)))
+        self._pending = []
+
+        cx, cy = self._cell_coords(self.positions)
+        keys = (cy * self.cols + cx).astype(self._key_type)
+        self.order = np.argsort(keys, kind='stable')
+        counts = np.bincount(keys, minlength=self.num_cells)
+        self.cell_start = np.zeros(self.num_cells + 1, dtype=np.intp)
+        np.cumsum(counts, out=self.cell_start[1:])
+
+    def insert(self, point, data):
+        '''
+            Inserts a single item, same signature as Quadtree.insert
+        '''
+        self._pending.append(((point[0], point[1]), data))
+        return True
+
+    def _flush(self):
+        if self._pending:
+            points = [p for p, _ in self._pending]
+            items = self.items + [d for _, d in self._pending]
+            positions = np.vstack([self.positions, np.array(points, dtype=float).reshape(-1, 2)])
+            self.build(positions, items)
+
+    def _candidates(self, cx, cy, reach):
+        '''
+            Entries of the buckets within reach buckets of the buckets (cx, cy)
+            return: (query index, item index) of every candidate pair
+        '''
+        queries = []
+        found = []
+        for dy in range(-reach, reach + 1):
+            ny = cy + dy
+            for dx in range(-reach, reach + 1):
+                nx = cx + dx
+                valid = np.flatnonzero((nx >= 0) & (nx < self.cols) & (ny >= 0) & (ny < self.rows))
+                if len(valid) == 0:
+                    continue
+                cell = ny[valid] * self.cols + nx[valid]
+                start = self.cell_start[cell]
+                count = self.cell_start[cell + 1] - start
+                total = count.sum()
+                if total == 0:
+                    continue
+                # expands every bucket [start, start+count) into a flat list of entries
+                first = np.repeat(start - np.cumsum(count) + count, count)
+                queries.append(np.repeat(valid, count))
+                found.append(self.order[first + np.arange(total)])
+        if not queries:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+        return np.concatenate(queries), np.concatenate(found)
+
+    def query_radius_batch(self, points, radius):
+        '''
+            Finds the items within radius of every point
+
+            points: array (M,2) of positions
+            radius: search radius
+            return: (offsets, indices) the items close to point i are
+                    indices[offsets[i]:offsets[i+1]], sorted by distance
+        '''
+        self._flush()
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        offsets = np.zeros(len(points) + 1, dtype=np.intp)
+        if len(points) == 0 or len(self.positions) == 0:
+            return offsets, np.zeros(0, dtype=np.intp)
+
+        cx, cy = self._cell_coords(points)
+        reach = int(ceil(radius / self.cell_size))
+        q, idx = self._candidates(cx, cy, reach)
+
+        diff = self.positions[idx] - points[q]
+        dist2 = np.einsum('ij,ij->i', diff, diff)
+        inside = dist2 <= radius * radius
+        q, idx, dist2 = q[inside], idx[inside], dist2[inside]
+
+        # groups by query point, closest first
+        order = np.lexsort((dist2, q))
+        np.cumsum(np.bincount(q, minlength=len(points)), out=offsets[1:])
+        return offsets, idx[order]
+
+    def query(self, range_rect, found):
+        '''
+            Appends to found the items inside the rectangle range_rect, same signature as Quadtree.query
+
+            range_rect: Rect centered in (x,y) with half sizes (w,h)
+        '''
+        self._flush()
+        if len(self.positions) == 0:
+            return
+        x0, y0 = self._cell_coords(np.array([[range_rect.x - range_rect.w, range_rect.y - range_rect.h]]))
+        x1, y1 = self._cell_coords(np.array([[range_rect.x + range_rect.w, range_rect.y + range_rect.h]]))
+        for row in range(y0[0], y1[0] + 1):
+            start = self.cell_start[row * self.cols + x0[0]]
+            end = self.cell_start[row * self.cols + x1[0] + 1]
+            for i in self.order[start:end]:
+                p = self.positions[i]
+                if abs(p[0] - range_rect.x) <= range_rect.w and abs(p[1] - range_rect.y) <= range_rect.h:
+                    found.append(self.items[i])
+
+    def query_indices(self, range_rect):
+        '''
+            Indices of the items inside the rectangle range_rect, same signature as Quadtree.query_indices
+
+            range_rect: Rect centered in (x,y) with half sizes (w,h)
+            return: sorted array of item indices
+        '''
+        self._flush()
+        if len(self.positions) == 0:
+            return np.zeros(0, dtype=np.intp)
+        x0, y0 = self._cell_coords(np.array([[range_rect.x - range_rect.w, range_rect.y - range_rect.h]]))
+        x1, y1 = self._cell_coords(np.array([[range_rect.x + range_rect.w, range_rect.y + range_rect.h]]))
+        # buckets of a row of the grid are contiguous in order
+        rows = np.arange(y0[0], y1[0] + 1)
+        starts = self.cell_start[rows * self.cols + x0[0]]
+        ends = self.cell_start[rows * self.cols + x1[0] + 1]
+        candidates = np.concatenate([self.order[start:end] for start, end in zip(starts, ends)])
+        p = self.positions[candidates]
+        inside = (np.abs(p[:, 0] - range_rect.x) <= range_rect.w) & (np.abs(p[:, 1] - range_rect.y) <= range_rect.h)
+        return np.sort(candidates[inside])
@@ -0,0 +1,52 @@
+import pygame as pg
+
+import assets
+from constants import SPRITE_ROTATION_STEPS
+
+
+class SpriteAtlas(object):
+    '''
+        Animation frames of a sprite pre-rendered at their final scale and at rotation_steps
+        angles evenly spaced around the circle, so drawing a rotated frame is a lookup instead of a rotozoom.
+        Atlases are kept in the asset registry and shared by every sprite made of the same images, see SpriteAtlas.load.
+    '''
+
+    def __init__(self, images, scale=1.0, rotation_steps=SPRITE_ROTATION_STEPS):
+        """
+        Args:
+            images: surfaces of the animation frames
+            scale: scale of the rendered frames
+            rotation_steps: number of angles rendered, 1 renders the frames unrotated only
+        """
+        self.rotation_steps = max(1, int(rotation_steps))
+        self.step = 360 / self.rotation_steps
+        # rotated[frame][step] is the frame rotated by step * self.step degrees
+        self.rotated = [[pg.transform.rotozoom(image, i * self.step, scale) for i in range(self.rotation_steps)]
+                        for image in images]
+        self.frames = [rotations[0] for rotations in self.rotated]
+
+    @classmethod
+    def load(cls, paths, scale=1.0, rotation_steps=SPRITE_ROTATION_STEPS):
+        '''
+            Atlas of the images in paths, loaded and rendered only the first time it is requested
+
+            paths: files of the animation frames
+            return: SpriteAtlas
+        '''
+        paths = tuple(paths)
+        return assets.get(('atlas', paths, scale, rotation_steps),
+                          lambda: cls(assets.load_images(paths), scale, rotation_steps))
+
+    def __len__(self):
+        return len(self.rotated)
+
+    def get(self, frame, angle=0):
+        '''
+            Frame rotated by the closest pre-rendered angle
+
+            frame: index of the animation frame
+            angle: degrees counterclockwise, as in pg.transform.rotate
+            return: Surface
+        '''
+        step = round(angle / self.step) % self.rotation_steps
+        return self.rotated[frame % len(self.rotated)][step]
@@ -116,7 +116,12 @@ class SeekState(State):
                 pos_in_grid = agent.position_in_grid
                 agent.grid_map.change_state_cell(pos_in_grid, OBSTACLE )
 
-                state_machine.change_state(GoToClosestDroneState())  
+                # goes around the obstacles following a planned path, wanders if there is none
+                path = agent.path_planner.plan(agent.location, self.target) if agent.path_planner else None
+                if path:
+                    state_machine.change_state(FollowPathState(path))
+                else:
+                    state_machine.change_state(GoToClosestDroneState())  
 
     def execute(self, agent):
         # logic to move drone to target
@@ -133,6 +138,54 @@ class SeekState(State):
             self.time_executing = 0 
             self.memory_last_position = copy.deepcopy(agent.get_position())
 
+class FollowPathState(State):
+    """
+        Drone will follow the waypoints of a planned path and seek the last one
+    """
+    def __init__(self, waypoints):
+        self.state_name = 'FollowPathState'
+        self.time_executing = 0 #Variavel para contagem do tempo de execução 
+        self.waypoints = waypoints
+        self.next_waypoint = 0
+        self.finished = False
+
+        # for checking if it is blocked
+        self.memory_last_position = vec2(inf,inf)
+        self.sampling_time = 2
+        self.blocked = False
+
+    def check_transition(self, agent, state_machine):
+        # New target from mouse click, scans do not change the target of drones following a path
+        if agent.get_target():
+            state_machine.change_state(SeekState())
+            return
+
+        # last waypoint reached or blocked again: seeks the goal of the path
+        if self.finished or self.blocked:
+            agent.set_target(self.waypoints[-1])
+            state_machine.change_state(SeekState())
+
+    def execute(self, agent):
+        waypoint = self.waypoints[self.next_waypoint]
+
+        if self.next_waypoint == len(self.waypoints) - 1:
+            # goal of the path
+            agent.arrive(waypoint)
+            if (waypoint - agent.location).length() <= RADIUS_TARGET:
+                self.finished = True
+        else:
+            # full speed through intermediate waypoints
+            agent.seek(waypoint)
+            if (waypoint - agent.location).length() <= RESOLUTION:
+                self.next_waypoint += 1
+
+        self.time_executing += SAMPLE_TIME
+        # Sampling location every T seconds
+        if self.time_executing >= self.sampling_time:
+            self.time_executing = 0
+            self.blocked = self.memory_last_position.distance_to(agent.get_position()) < 30
+            self.memory_last_position = copy.deepcopy(agent.get_position())
+
 class GoToClosestDroneState(State):
     """
         Drone will seek closest drone in swarm  
@@ -296,8 +349,13 @@ class SearchTargetState(State):
             if len(self.waypoints) > 0: # enquanto existem celulas nao visitadas na regiao
                 targ = random.choice(self.waypoints)
                 self.target = targ
-            else: # random na tela para buscar ja que todas as celulas foram visitadas
-                self.target = vec2(random.uniform(0,WORLD_WIDTH),random.uniform(0,WORLD_HEIGHT))
+            else:
+                # every neighbor was visited: goes to the closest cell not visited
+                nearest = agent.grid_map.get_nearest_unvisited(agent.location)
+                if nearest:
+                    self.target = agent.grid_map.get_cell_center(nearest[0])
+                else: # random na tela para buscar ja que todas as celulas foram visitadas
+                    self.target = vec2(random.uniform(0,WORLD_WIDTH),random.uniform(0,WORLD_HEIGHT))
 
             #rint(f'EU IRIA PARA A CELULA : {agent.grid_map.get_cell_not_visited()}')
 
@@ -1,22 +1,62 @@
 import pygame
+import numpy as np
 from random import uniform
 from typing import List
 from vehicle import Vehicle
-from state_machine import FiniteStateMachine, SeekState, SearchTargetState
-from constants import SCREEN_WIDTH, SCREEN_HEIGHT, LIGHT_BLUE, RESOLUTION, WORLD_WIDTH, WORLD_HEIGHT
+from state_machine import FiniteStateMachine, SeekState, SearchTargetState, FollowPathState
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT, LIGHT_BLUE, TRAIL_SCREEN_LENGTH, RESOLUTION, WORLD_WIDTH, WORLD_HEIGHT, AVOID_DISTANCE, NEIGHBOR_INDEX, SENSOR_RADIUS, LEGEND_MIN_ZOOM, VIEW_CULL_MARGIN
 from quadtree import Quadtree, Rect
+from spatial_hash import SpatialHash
+from swarm_state import SwarmState
 
 vec2 = pygame.math.Vector2
 
+# neighbors are searched once per step within the largest radius used by the drones
+# (alignment uses AVOID_DISTANCE * 2.2, collision avoidance AVOID_DISTANCE * 2)
+NEIGHBOR_RADIUS_FACTOR = 2.2
+
 class SwarmManager:
-    def __init__(self, display_manager):
+    def __init__(self, display_manager=None):
+        """
+        Args:
+            display_manager: DisplayManager used to draw the swarm, None when running headless
+        """
         self.swarm: List[Vehicle] = []
         self.behaviors = []
         self.display_manager = display_manager
+        # position, velocity, acceleration, rotation and track of every drone in contiguous arrays
+        self.state = SwarmState()
+        # neighbor search between drones
+        self.neighbor_index = self._make_neighbor_index(NEIGHBOR_INDEX)
+
+    @staticmethod
+    def _make_neighbor_index(kind):
+        """Creates the neighbor search backend: 'spatial_hash' or 'quadtree'."""
+        if kind == 'quadtree':
+            boundary = Rect(WORLD_WIDTH/2, WORLD_HEIGHT/2, WORLD_WIDTH/2, WORLD_HEIGHT/2)
+            return Quadtree(boundary, 4) # Capacity 4
+        if kind == 'spatial_hash':
+            # cells sized to the avoid distance
+            return SpatialHash(AVOID_DISTANCE, WORLD_WIDTH, WORLD_HEIGHT)
+        raise ValueError(f'Unknown neighbor index: {kind}')
+
+    @property
+    def world_surface(self):
+        """World surface drones draw debug lines on, None when running headless or drawing in screen space."""
+        if self.display_manager is None or self.display_manager.screen_space:
+            return None
+        return self.display_manager.world_surface
+
+    def update_window(self):
+        """Points the debug lines of every drone at the current world surface, after the renderer changed."""
+        window = self.world_surface
+        for drone in self.swarm:
+            drone.window = window
 
     def create_swarm(self, num_swarm, search_pattern='DefineTargetScan'):
         self.swarm = []
         self.behaviors = []
+        self.state.clear()
         for d in range(0, num_swarm):
             # Seek state: se tem o target inicialmente:
             if search_pattern == 'RowScan':
@@ -24,12 +64,12 @@ class SwarmManager:
             else:
                 self.behaviors.append( FiniteStateMachine( SeekState() ) ) # Inicial state
 
-            drone = Vehicle(uniform(0,100), uniform(0,100), self.behaviors[-1], self.display_manager.world_surface)
+            drone = Vehicle(uniform(0,100), uniform(0,100), self.behaviors[-1], self.world_surface, self.state)
             self.swarm.append(drone)
 
     def add_new_uav(self):
         self.behaviors.append( FiniteStateMachine( SeekState() ) )
-        drone = Vehicle(WORLD_WIDTH/2, WORLD_HEIGHT/2, self.behaviors[-1], self.display_manager.world_surface)
+        drone = Vehicle(WORLD_WIDTH/2, WORLD_HEIGHT/2, self.behaviors[-1], self.world_surface, self.state)
 
         # Convert mouse position to world coordinates for target
         mouse_pos = vec2(pygame.mouse.get_pos()[0], pygame.mouse.get_pos()[1])
@@ -44,36 +84,63 @@ class SwarmManager:
             if found:
                 drone.found = True
 
-    def update(self, simulation, list_obst):
+    def following_path(self):
+        """Boolean array, True for the drones following a planned path (FollowPathState), which own their target."""
+        return np.array([isinstance(drone.behavior.state, FollowPathState) for drone in self.swarm], dtype=bool)
+
+    def update(self, simulation, list_obst, obstacles=None):
         """
         Updates the entire swarm:
-        1. Builds Quadtree
-        2. Updates grid
-        3. Updates physics/behavior (collision avoidance, etc.)
-        4. Draws drones
+        1. Builds neighbor index and finds neighbors and close obstacles of every drone at once
+        2. Marks the sensor footprint of the whole swarm on the grid
+        3. Updates behavior (collision avoidance, state machines, etc.)
+        4. Updates physics of the whole swarm at once (drag, velocity limit, integration)
+
+        Nothing is drawn here, see draw().
+
+        Args:
+            simulation: The current simulation
+            list_obst: positions of the obstacles
+            obstacles: Obstacles whose spatial index and repulsion field cover list_obst,
+                       None checks every drone against the whole list_obst
         """
-        # Build Quadtree
-        boundary = Rect(WORLD_WIDTH/2, WORLD_HEIGHT/2, WORLD_WIDTH/2, WORLD_HEIGHT/2)
-        quadtree = Quadtree(boundary, 4) # Capacity 4
-        
-        for drone in self.swarm:
-            quadtree.insert(drone.location, drone)
+        # Build neighbor index and query the neighbors of the whole swarm
+        positions = self.state.position[:self.state.count]
+        self.neighbor_index.build(positions, self.swarm)
+        offsets, indices = self.neighbor_index.query_radius_batch(positions, AVOID_DISTANCE * NEIGHBOR_RADIUS_FACTOR)
+
+        # Obstacles close to every drone, from the static obstacle index
+        if obstacles is not None:
+            obst_offsets, obst_indices = obstacles.query_nearby_batch(positions)
+
+        # Obstacle repulsion sampled from the precomputed raster, when available
+        obstacle_forces = None
+        if obstacles is not None and obstacles.repulsion_field is not None:
+            obstacle_forces = obstacles.repulsion_field.sample(positions)
 
         target_found = False
+
+        # Update grid with the sensor footprint of the whole swarm
+        self._update_grid(positions, simulation)
         
         for index, drone in enumerate(self.swarm):
-            # Update grid with drone's position
-            self._update_grid(drone, simulation)
-            
-            # Update drone physics and behavior
-            drone.align_direction_with_swarm(quadtree, index)
-            drone.collision_avoidance(quadtree, list_obst, index) 
-            drone.update()
-            
-            # Draw drone
-            drone.draw(self.display_manager.world_surface)
-            self._draw_legend(drone, index)
+            neighbors = [self.swarm[j] for j in indices[offsets[index]:offsets[index+1]] if j != index]
+            if obstacles is not None:
+                nearby_obst = [list_obst[j] for j in obst_indices[obst_offsets[index]:obst_offsets[index+1]]]
+            else:
+                nearby_obst = list_obst
             
+            # Update drone behavior, forces are accumulated in the swarm state
+            drone.align_direction_with_swarm(self.neighbor_index, index, neighbors)
+            obstacle_force = None if obstacle_forces is None else vec2(obstacle_forces[index, 0], obstacle_forces[index, 1])
+            drone.collision_avoidance(self.neighbor_index, nearby_obst, index, neighbors, obstacle_force) 
+            drone.update_behavior()
+
+        # Drag, force limiting, integration and world constraints for the whole swarm in one call
+        self.state.step()
+        self.state.record_track()
+
+        for drone in self.swarm:
             # Check if drone reached the target
             if simulation.target_simulation and drone.reached_goal(simulation.target_simulation):
                 simulation.found = True
@@ -82,15 +149,16 @@ class SwarmManager:
                 
         return target_found
 
-    def _update_grid(self, drone, simulation) -> None:
-        """Updates the grid with the drone's current position."""
-        # Calculate grid position
-        col, row = self._get_grid_position(drone)
+    def _update_grid(self, positions, simulation) -> None:
+        """Marks the sensor footprint of every drone on the grid and updates the drones grid position."""
+        grid = simulation.grid_field
+        grid.mark_footprints(positions, SENSOR_RADIUS)
 
-        # Update grid and drone state
-        simulation.grid_field.change_state_cell((col, row))
-        drone.set_position_in_grid(col, row)
-        drone.save_grid(simulation.grid_field)
+        cols, rows = grid.get_cell_of_positions(positions)
+        for drone, col, row in zip(self.swarm, cols.tolist(), rows.tolist()):
+            drone.set_position_in_grid(col, row)
+            drone.save_grid(grid)
+            drone.save_path_planner(simulation.path_planner)
 
     def _get_grid_position(self, drone) -> tuple:
         """Calculates the grid position of a drone."""
@@ -99,22 +167,72 @@ class SwarmManager:
         row = int(p.y / RESOLUTION)
         return col, row
 
-    def _draw_legend(self, drone, index) -> None:
-        """Draws information text beneath the drone."""
+    def draw(self, surface, visible=None, view=None) -> list:
+        """
+            Draws every drone and its legend on the given surface.
+            visible: rect of the world on screen, only drones close to it are drawn. Every drone when None
+            view: DisplayManager to draw on the screen, None draws in world coordinates
+            return: list of rects drawn
+        """
+        rects = []
+        # level of detail: legends are unreadable when zoomed out
+        legends = self.display_manager.zoom_level >= LEGEND_MIN_ZOOM
+        # sprites and legends keep their size on the screen, the margin grows in the world
+        margin = VIEW_CULL_MARGIN if view is None else VIEW_CULL_MARGIN / view.zoom_level
+        for index in self._visible_drones(visible, margin):
+            drone = self.swarm[index]
+            rects.extend(drone.draw(surface, view))
+            if legends:
+                rects.append(self._draw_legend(drone, index, surface, view))
+        return rects
+
+    def draw_tracks(self, surface, view=None, width=1, length=TRAIL_SCREEN_LENGTH) -> list:
+        """
+            Draws the last length positions of the track of every drone from the ring buffer of the swarm state.
+            Used when the trails are not accumulated on a TrailLayer, they are redrawn every frame
+            view: DisplayManager to draw on the screen, None draws in world coordinates
+            return: list of rects drawn
+        """
+        rects = []
+        for index, drone in enumerate(self.swarm[:self.state.count]):
+            points = self.state.get_track(index, self.state.track_count[index] - length)
+            if len(points) < 2:
+                continue
+            if view is not None:
+                points = points * view.zoom_level + (view.offset.x, view.offset.y)
+            rects.append(pygame.draw.lines(surface, drone.color_target, False, points.tolist(), width))
+        return rects
+
+    def _visible_drones(self, visible, margin=VIEW_CULL_MARGIN):
+        """Indices of the drones within margin of the visible rect, from the neighbor index."""
+        if visible is None:
+            return range(len(self.swarm))
+        area = visible.inflate(2 * margin, 2 * margin)
+        # the index was built before the last step, drones moved a few pixels at most since then
+        indices = self.neighbor_index.query_indices(Rect(area.centerx, area.centery, area.width / 2, area.height / 2))
+        indexed = len(self.neighbor_index.items)
+        # drones added after the index was built are always drawn
+        return [i for i in indices.tolist() if i < len(self.swarm)] + list(range(indexed, len(self.swarm)))
+
+    def _draw_legend(self, drone, index, screen, view=None):
+        """Draws information text beneath the drone, returns the rect covering it."""
         position = drone.get_position()
-        screen = self.display_manager.world_surface
+        if view is not None:
+            position = view.world_to_screen(position)
         font20 = self.display_manager.font20
         font16 = self.display_manager.font16
+        render = self.display_manager.render_text
         
         # Drone ID
-        drone_id_text = font20.render(f'Drone {index+1}', True, LIGHT_BLUE)
-        screen.blit(drone_id_text, position + (0, 20))
+        drone_id_text = render(font20, f'Drone {index+1}', LIGHT_BLUE)
+        rect = screen.blit(drone_id_text, position + (0, 20))
         
         # Current behavior
-        behavior_text = font16.render(drone.behavior.get_current_state(), True, LIGHT_BLUE)
-        screen.blit(behavior_text, position + (0, 30))
+        behavior_text = render(font16, drone.behavior.get_current_state(), LIGHT_BLUE)
+        rect.union_ip(screen.blit(behavior_text, position + (0, 30)))
         
         # Current grid position
         col, row = self._get_grid_position(drone)
-        pos_text = font16.render(f'Pos:{col},{row}', True, LIGHT_BLUE)
-        screen.blit(pos_text, position + (0, 40))
+        pos_text = render(font16, f'Pos:{col},{row}', LIGHT_BLUE)
+        rect.union_ip(screen.blit(pos_text, position + (0, 40)))
+        return rect
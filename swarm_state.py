@@ -0,0 +1,152 @@
+import numpy as np
+from constants import WORLD_WIDTH, WORLD_HEIGHT, MASS, FORWARD_SPEED, SIZE_TRACK
+
+# Aerodynamic drag parameters
+DRAG_COEFFICIENT = 0.5
+AREA = 0.1 # Approximate frontal area
+AIR_DENSITY = 1.225 # kg/m^3 (sea level)
+
+
+class SwarmState(object):
+    '''
+        Structure of arrays holding the physical state of every drone in the swarm.
+        Position, velocity, acceleration, target and rotation are stored in contiguous float arrays,
+        so drag, force limiting and integration run for the whole swarm in one call.
+        Vehicles are thin views into one row of these arrays.
+        The last track_length positions of every drone are kept in a preallocated ring buffer (track).
+    '''
+    def __init__(self, capacity=16, track_length=SIZE_TRACK):
+        self.count = 0 # number of drones stored
+        self.capacity = 0
+        self.position = np.zeros((0, 2))
+        self.velocity = np.zeros((0, 2))
+        self.acceleration = np.zeros((0, 2))
+        self.target = np.zeros((0, 2)) # target set by the scan, NaN when the drone has none
+        self.rotation = np.zeros(0)
+        self.max_speed = np.zeros(0)
+        # track[i, k % track_length] is the k-th position recorded for drone i
+        self.track_length = max(1, int(track_length))
+        self.track = np.zeros((0, self.track_length, 2))
+        self.track_count = np.zeros(0, dtype=np.intp) # positions recorded per drone, including overwritten ones
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        '''
+            Grows the arrays keeping the state of the drones already stored
+        '''
+        n = self.count
+        for name in ('position', 'velocity', 'acceleration', 'target'):
+            array = np.full((capacity, 2), np.nan) if name == 'target' else np.zeros((capacity, 2))
+            array[:n] = getattr(self, name)[:n]
+            setattr(self, name, array)
+        for name in ('rotation', 'max_speed'):
+            array = np.zeros(capacity)
+            array[:n] = getattr(self, name)[:n]
+            setattr(self, name, array)
+        track = np.zeros((capacity, self.track_length, 2))
+        track[:n] = self.track[:n]
+        self.track = track
+        track_count = np.zeros(capacity, dtype=np.intp)
+        track_count[:n] = self.track_count[:n]
+        self.track_count = track_count
+        self.capacity = capacity
+
+    def add(self, x, y, vx=0.1, vy=0.0, rotation=0.0, max_speed=FORWARD_SPEED):
+        '''
+            Stores a new drone
+            return: index of the drone in the arrays
+        '''
+        if self.count == self.capacity:
+            self._allocate(max(1, self.capacity * 2))
+
+        index = self.count
+        self.position[index] = (x, y)
+        self.velocity[index] = (vx, vy)
+        self.acceleration[index] = (0, 0)
+        self.target[index] = np.nan
+        self.rotation[index] = rotation
+        self.max_speed[index] = max_speed
+        self.track_count[index] = 0
+        self.count += 1
+        return index
+
+    def clear(self):
+        '''
+            Removes every drone, arrays are kept allocated
+        '''
+        self.count = 0
+
+    def _rows(self, index):
+        # whole swarm or a single drone, both as views of the arrays
+        if index is None:
+            return slice(0, self.count)
+        return slice(index, index + 1)
+
+    def apply_drag(self, index=None):
+        '''
+            Applies aerodynamic drag force to every drone (or only to drone index)
+            F = -1/2 * rho * A * Cd * |v| * v
+        '''
+        rows = self._rows(index)
+        velocity = self.velocity[rows]
+        speed = np.sqrt(np.einsum('ij,ij->i', velocity, velocity))
+        drag = -0.5 * AIR_DENSITY * AREA * DRAG_COEFFICIENT * speed[:, None] * velocity
+        self.acceleration[rows] += drag / MASS # Newton's second law
+
+    def integrate(self, index=None):
+        '''
+            Integrates acceleration for every drone (or only drone index):
+            limits velocity to max_speed, updates position and rotation,
+            constrains position to the world and resets acceleration
+        '''
+        rows = self._rows(index)
+        velocity = self.velocity[rows]
+        position = self.position[rows]
+
+        # Updates velocity at every step and limits it to max_speed
+        velocity += self.acceleration[rows]
+        speed = np.sqrt(np.einsum('ij,ij->i', velocity, velocity))
+        max_speed = self.max_speed[rows]
+        too_fast = speed > max_speed
+        velocity[too_fast] *= (max_speed[too_fast] / speed[too_fast])[:, None]
+        np.minimum(speed, max_speed, out=speed)
+
+        # updates position
+        position += velocity
+
+        # Prevents it from crazy spinning due to very low noise speeds
+        moving = speed > 0.8
+        self.rotation[rows][moving] = np.arctan2(velocity[moving, 1], velocity[moving, 0])
+
+        # Constrains position to limits of the world
+        np.clip(position[:, 0], 0, WORLD_WIDTH, out=position[:, 0])
+        np.clip(position[:, 1], 0, WORLD_HEIGHT, out=position[:, 1])
+        self.acceleration[rows] = 0
+
+    def record_track(self, index=None):
+        '''
+            Stores the current position of every drone (or only drone index) in the track ring buffer,
+            the oldest position is overwritten once track_length positions were recorded
+        '''
+        rows = np.arange(self.count) if index is None else np.array([index])
+        self.track[rows, self.track_count[rows] % self.track_length] = self.position[rows]
+        self.track_count[rows] += 1
+
+    def get_track(self, index, start=0):
+        '''
+            Positions recorded for drone index from the start-th on, oldest first.
+            Positions already overwritten in the ring buffer are not returned
+
+            return: array (n, 2)
+        '''
+        end = self.track_count[index]
+        start = max(start, end - self.track_length, 0)
+        slots = np.arange(start, end) % self.track_length
+        return self.track[index, slots]
+
+    def step(self):
+        '''
+            Drag and integration for the whole swarm in one call
+        '''
+        self.apply_drag()
+        self.integrate()
@@ -0,0 +1,163 @@
+import contextlib
+import io
+import os
+import traceback
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from experiment_manager import ExperimentManager
+from scan import SCAN_ALGORITHMS
+from simulation import Simulation, obstacle_generation
+
+# One simulation of the plan, sent to a worker process
+SweepTask = namedtuple('SweepTask', ['idx', 'num_swarm', 'num_obstacles', 'algorithm', 'seed',
+                                     'run_seed', 'obstacle_generation'])
+
+RUN_FAILED = "Run failed"
+
+
+def run_task(task: SweepTask) -> dict:
+    """Runs a single simulation of the plan headless. Executed in a worker process.
+
+    Args:
+        task: simulation to be executed
+
+    Returns:
+        dict: outputs of the simulation, same values stored by ExperimentManager
+    """
+    experiment_manager = ExperimentManager(1, [task.num_swarm], [task.num_obstacles],
+                                           [SCAN_ALGORITHMS[task.algorithm]()])
+    # state machines print every transition, keep worker output quiet
+    with contextlib.redirect_stdout(io.StringIO()):
+        # same obstacles and random generators as simulation idx of the plan executed in sequence
+        simulation = Simulation(None, experiment_manager, task.seed, task.run_seed, task.obstacle_generation)
+        while simulation.run_simulation():
+            pass
+
+    return {
+        'time_target': experiment_manager.out_time_target[0],
+        'time_mission': experiment_manager.out_time_mission[0],
+        'num_uav': experiment_manager.out_num_uav[0],
+        'coverage_curve': experiment_manager.out_coverage_curve[0],
+    }
+
+
+def available_cpus() -> int:
+    """CPUs the process may run on, fewer than os.cpu_count() when it is pinned or limited by a container."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class SweepRunner(object):
+    '''
+        Runs the simulations planned in an ExperimentManager in parallel worker processes.
+        Every (swarm size, obstacle count, algorithm, seed) entry of the plan is sent to a worker
+        and the outputs are gathered in the experiment manager in plan order.
+    '''
+    def __init__(self, max_workers=None, max_retries=1, base_seed=0):
+        """
+        Args:
+            max_workers: number of worker processes, None uses every CPU available to the process
+            max_retries: times a simulation is retried after its worker crashed
+            base_seed: seed of the plan, the outputs are the same as run_headless(experiment_manager, base_seed)
+        """
+        self.max_workers = max_workers or available_cpus()
+        self.max_retries = max_retries
+        self.base_seed = base_seed
+        self.failed = [] # idx of simulations that could not be executed
+        self._num_tasks = 0
+
+    def plan(self, experiment_manager: ExperimentManager) -> list:
+        """Expands the plan of the experiment manager into tasks."""
+        return [SweepTask(idx,
+                          experiment_manager.in_num_swarm[idx],
+                          experiment_manager.in_num_obstacles[idx],
+                          experiment_manager.in_algorithms[idx].to_string(),
+                          self.base_seed,
+                          self.base_seed + idx,
+                          obstacle_generation(experiment_manager, idx))
+                for idx in range(experiment_manager.in_repetitions)]
+
+    def run(self, experiment_manager: ExperimentManager) -> ExperimentManager:
+        """Runs every simulation planned and stores the outputs in plan order.
+
+        Args:
+            experiment_manager: plan of simulations to be executed
+
+        Returns:
+            ExperimentManager: the same manager, filled with the outputs of every simulation
+        """
+        tasks = self.plan(experiment_manager)
+        self._num_tasks = len(tasks)
+        results = [None] * len(tasks)
+        self.failed = []
+
+        queue = deque(tasks)
+        while queue:
+            # a worker that dies breaks the whole pool and every simulation running in it,
+            # those are executed again one at a time to find the one that crashed
+            for task in self._run_pool(queue, results):
+                self._run_isolated(task, results)
+
+        for result in results:
+            if result is None:
+                result = {'time_target': RUN_FAILED, 'time_mission': RUN_FAILED, 'num_uav': 0, 'coverage_curve': []}
+            experiment_manager.set_time_target(result['time_target'])
+            experiment_manager.set_out(result['time_mission'], result['num_uav'], result['coverage_curve'])
+
+        return experiment_manager
+
+    def _run_pool(self, queue: deque, results: list) -> list:
+        """Runs the tasks of the queue keeping at most max_workers simulations in flight.
+
+        Returns:
+            list: tasks that were running when a worker crashed, empty if none crashed
+        """
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while queue or running:
+                while queue and len(running) < self.max_workers:
+                    task = queue.popleft()
+                    running[executor.submit(run_task, task)] = task
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                broken = []
+                for future in done:
+                    task = running.pop(future)
+                    try:
+                        self._store(task, future.result(), results)
+                    except BrokenProcessPool:
+                        broken.append(task)
+                    except Exception:
+                        self._fail(task, 'simulation failed', print_traceback=True)
+
+                if broken:
+                    return broken + list(running.values())
+        return []
+
+    def _run_isolated(self, task: SweepTask, results: list) -> None:
+        """Runs a task alone in its own worker, retrying it if the worker crashes."""
+        for _ in range(self.max_retries + 1):
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                try:
+                    self._store(task, executor.submit(run_task, task).result(), results)
+                    return
+                except BrokenProcessPool:
+                    continue
+                except Exception:
+                    self._fail(task, 'simulation failed', print_traceback=True)
+                    return
+        self._fail(task, 'worker crashed, giving up')
+
+    def _store(self, task: SweepTask, result: dict, results: list) -> None:
+        results[task.idx] = result
+        print(f'{task.idx+1}/{self._num_tasks} - {task.algorithm}, num_swarm: {task.num_swarm}, '
+              f'num_obstacles: {task.num_obstacles} - done')
+
+    def _fail(self, task: SweepTask, reason: str, print_traceback: bool = False) -> None:
+        print(f'{task.idx+1}/{self._num_tasks} - {reason}')
+        if print_traceback:
+            traceback.print_exc()
+        self.failed.append(task.idx)
@@ -0,0 +1,70 @@
+from itertools import permutations
+
+import numpy as np
+
+from assignment import auction_assignment, split_regions
+
+
+def brute_force_cost(cost):
+    """Minimum total cost of assigning every row to a different column."""
+    rows = range(cost.shape[0])
+    return min(sum(cost[r, c] for r, c in zip(rows, cols))
+               for cols in permutations(range(cost.shape[1]), cost.shape[0]))
+
+
+def check_optimal(cost):
+    assigned = auction_assignment(cost)
+    assert len(assigned) == cost.shape[0]
+    assert len(set(assigned.tolist())) == len(assigned)
+    total = cost[np.arange(cost.shape[0]), assigned].sum()
+    # within num_rows * final epsilon of the optimum, see auction_assignment
+    assert total <= brute_force_cost(cost) + 1e-6 * (np.ptp(cost) or 1.0) + 1e-9
+
+
+def test_auction_is_optimal_on_small_problems():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        n = int(rng.integers(1, 7))
+        m = int(rng.integers(n, 8))
+        check_optimal(rng.uniform(0, 100, (n, m)))
+
+
+def test_auction_is_optimal_with_ties():
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        n = int(rng.integers(1, 7))
+        m = int(rng.integers(n, 8))
+        # few distinct values, many rows and columns with equal costs
+        check_optimal(rng.integers(0, 3, (n, m)).astype(float))
+    check_optimal(np.zeros((4, 6)))
+    check_optimal(np.ones((5, 5)))
+
+
+def test_auction_needs_enough_columns():
+    try:
+        auction_assignment(np.zeros((3, 2)))
+    except ValueError:
+        return
+    assert False, 'more rows than columns must raise ValueError'
+
+
+def test_split_regions_is_balanced():
+    rng = np.random.default_rng(2)
+    uniform = np.ones((43, 76))
+    holes = (rng.uniform(size=uniform.shape) >= 0.2).astype(float)
+    for weights in (uniform, holes):
+        # a cut can not split a line of cells, regions differ from the mean by less than a line of the grid
+        line = max(weights.sum(axis=0).max(), weights.sum(axis=1).max())
+        for num_regions in range(1, 41):
+            regions = split_regions(weights, num_regions)
+            assert len(regions) == num_regions
+
+            covered = np.zeros(weights.shape, dtype=int)
+            for r in regions:
+                covered[r.row0:r.row1, r.col0:r.col1] += 1
+                assert r.weight == weights[r.row0:r.row1, r.col0:r.col1].sum()
+                assert r.col0 <= r.start[0] < r.col1 and r.row0 <= r.start[1] < r.row1
+            # the regions tile the grid
+            assert np.all(covered == 1)
+            sizes = np.array([r.weight for r in regions])
+            assert np.abs(sizes - weights.sum() / num_regions).max() < line
@@ -0,0 +1,38 @@
+import numpy as np
+
+from constants import WORLD_WIDTH, WORLD_HEIGHT
+from grid import GridField, VISITED, OBSTACLE
+
+
+def brute_force(grid, position, k):
+    rows, cols = np.nonzero(grid.states[:grid.rows, :grid.cols] == 0)
+    dist2 = ((cols + 0.5) * grid.resolution - position[0]) ** 2 + ((rows + 0.5) * grid.resolution - position[1]) ** 2
+    return sorted(dist2)[:k]
+
+
+def test_nearest_unvisited_batch_matches_single_queries():
+    rng = np.random.default_rng(0)
+    for resolution, visited in ((50, 0.0), (50, 0.6), (35, 0.97), (50, 0.9995)):
+        grid = GridField(resolution)
+        cells = rng.uniform(size=grid.states.shape) < visited
+        rows, cols = np.nonzero(cells)
+        grid.change_state_cells(cols, rows, VISITED)
+        grid.change_state_cells(cols[::5], rows[::5], OBSTACLE)
+        # positions on cell centers give ties between cells
+        positions = np.vstack([rng.uniform((-100, -100), (WORLD_WIDTH + 100, WORLD_HEIGHT + 100), (40, 2)),
+                               (rng.integers(0, 20, (10, 2)) + 0.5) * resolution])
+
+        for k in (1, 4, 30):
+            batch = grid.get_nearest_unvisited_batch(positions, k)
+            assert len(batch) == len(positions)
+            for position, cells in zip(positions, batch):
+                assert cells == grid.get_nearest_unvisited(position, k)
+                dist2 = [((c + 0.5) * resolution - position[0]) ** 2 + ((r + 0.5) * resolution - position[1]) ** 2
+                         for c, r in cells]
+                assert np.allclose(dist2, brute_force(grid, position, k))
+
+
+def test_nearest_unvisited_batch_on_covered_grid():
+    grid = GridField(50)
+    grid.change_state_cells(*np.nonzero(grid.states.T == 0), VISITED)
+    assert grid.get_nearest_unvisited_batch([(10, 10), (200, 300)]) == [[], []]
@@ -0,0 +1,59 @@
+import numpy as np
+
+from constants import RESOLUTION, RADIUS_TARGET
+from experiment_manager import ExperimentManager
+from grid import GridField, OBSTACLE
+from path_planner import PathPlanner
+from scan import RandoWalkScan
+from simulation import Simulation
+from state_machine import FollowPathState
+
+
+def test_cached_path_survives_blocks_it_does_not_cross():
+    grid = GridField(RESOLUTION)
+    planner = PathPlanner(grid)
+    start, goal = (2, 2), (20, 2)
+
+    # a drone blocked in its cell marks it before every plan, repeating it keeps the cache
+    grid.change_state_cell((5, 10), OBSTACLE)
+    path = planner.plan_cells(start, goal)
+    grid.change_state_cell((5, 10), OBSTACLE)
+    assert planner.plan_cells(start, goal) is path
+
+    # a cell far from the path keeps it too
+    grid.change_state_cell((30, 20), OBSTACLE)
+    assert planner.plan_cells(start, goal) is path
+
+    # a cell on the path drops it
+    grid.change_state_cell(path[len(path) // 2], OBSTACLE)
+    new_path = planner.plan_cells(start, goal)
+    assert new_path is not path
+    assert path[len(path) // 2] not in new_path
+
+
+def test_follow_path_under_random_walk():
+    experiment_manager = ExperimentManager(1, [1], [0], [RandoWalkScan()])
+    simulation = Simulation(None, experiment_manager, seed=0, run_seed=0)
+    drone = simulation.swarm[0]
+    grid = simulation.grid_field
+
+    # wall between the drone and the goal, the path goes around it
+    grid.change_state_cells(np.full(15, 10), np.arange(15), OBSTACLE)
+    path = simulation.path_planner.plan(drone.location, (1000, 200))
+    assert len(path) > 1
+    follow = FollowPathState(path)
+    # as SeekState does when the drone is blocked
+    drone.set_target(None)
+    drone.behavior.change_state(follow)
+
+    reached = set()
+    for _ in range(3000):
+        simulation.run_simulation()
+        assert drone.behavior.state is follow
+        # intermediate waypoints are passed within RESOLUTION, the goal is reached within RADIUS_TARGET
+        reached.update(i for i, w in enumerate(path)
+                       if (w - drone.location).length() <= (RADIUS_TARGET if i == len(path) - 1 else RESOLUTION))
+        if follow.finished:
+            break
+    assert follow.finished
+    assert reached == set(range(len(path)))
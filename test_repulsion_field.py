@@ -0,0 +1,43 @@
+import numpy as np
+
+from constants import (WORLD_WIDTH, WORLD_HEIGHT, NUM_OBSTACLES, AVOID_OBSTACLES, AVOID_DISTANCE,
+                       SEEK_FORCE, REPULSION_FIELD_RESOLUTION)
+from obstacle import Obstacles
+from repulsion_field import RepulsionField, analytic_repulsion
+
+RADIUS = AVOID_OBSTACLES + AVOID_DISTANCE
+# largest force of a single obstacle, see analytic_repulsion
+MAX_FORCE = SEEK_FORCE * 1.8
+# max error of sample() against analytic_repulsion, away from the discontinuities of the force
+MAX_ERROR = 0.1 * MAX_FORCE
+MEAN_ERROR = 0.05 * MAX_FORCE
+
+
+def sample_points(field, num_samples, rng):
+    """Random points within 1.2 times the avoid radius of the obstacles, inside the raster."""
+    centers = field.obstacles[rng.integers(len(field.obstacles), size=num_samples)]
+    angle = rng.uniform(0, 2 * np.pi, num_samples)
+    dist = 1.2 * RADIUS * np.sqrt(rng.uniform(0, 1, num_samples))
+    points = centers + np.stack([np.cos(angle), np.sin(angle)], axis=1) * dist[:, None]
+    return np.clip(points, 0, [(field.cols - 1) * field.resolution, (field.rows - 1) * field.resolution])
+
+
+def test_sample_matches_analytic_force():
+    resolution = REPULSION_FIELD_RESOLUTION
+    for seed in range(3):
+        obstacles = Obstacles(NUM_OBSTACLES, (WORLD_WIDTH, WORLD_HEIGHT), seed)
+        obstacles.generate_obstacles()
+        field = RepulsionField(obstacles.get_coordenates(), resolution)
+
+        rng = np.random.default_rng(seed)
+        points = sample_points(field, 5000, rng)
+        error = np.linalg.norm(field.sample(points) - analytic_repulsion(points, field.obstacles), axis=1)
+        assert error.mean() <= MEAN_ERROR
+
+        # the force is cut off at RADIUS and flips direction over the obstacle,
+        # points closer than a node diagonal to those cannot be interpolated
+        dist = np.linalg.norm(points[:, None, :] - field.obstacles[None, :, :], axis=2)
+        band = resolution * np.sqrt(2)
+        smooth = ~((np.abs(dist - RADIUS) < band) | (dist < band)).any(axis=1)
+        assert smooth.mean() > 0.7
+        assert error[smooth].max() <= MAX_ERROR
@@ -0,0 +1,63 @@
+import numpy as np
+import pygame
+
+from constants import WORLD_WIDTH, WORLD_HEIGHT
+from quadtree import Quadtree, Rect
+from spatial_hash import SpatialHash
+
+
+def make_indices():
+    boundary = Rect(WORLD_WIDTH/2, WORLD_HEIGHT/2, WORLD_WIDTH/2, WORLD_HEIGHT/2)
+    return [SpatialHash(50, WORLD_WIDTH, WORLD_HEIGHT), Quadtree(boundary, 4)]
+
+
+def brute_force(positions, points, radius):
+    d2 = ((points[:, None, :] - positions[None, :, :]) ** 2).sum(axis=2)
+    return [set(np.flatnonzero(row <= radius * radius).tolist()) for row in d2]
+
+
+def check_radius_batch(index, positions, points, radius):
+    offsets, indices = index.query_radius_batch(points, radius)
+    expected = brute_force(positions, points, radius)
+    assert len(offsets) == len(points) + 1
+    for i, point in enumerate(points):
+        found = indices[offsets[i]:offsets[i+1]]
+        assert set(found.tolist()) == expected[i]
+        # sorted by distance
+        dist = np.hypot(*(positions[found] - point).T)
+        assert np.all(np.diff(dist) >= -1e-9)
+
+
+def test_query_radius_batch_matches_brute_force():
+    rng = np.random.default_rng(0)
+    positions = rng.uniform((0, 0), (WORLD_WIDTH, WORLD_HEIGHT), (300, 2))
+    # clustered points, several in the same cell and on the same spot
+    positions[:40] = rng.uniform((1000, 1000), (1100, 1100), (40, 2))
+    positions[40:45] = positions[0]
+    points = np.vstack([positions[:60], rng.uniform((0, 0), (WORLD_WIDTH, WORLD_HEIGHT), (60, 2))])
+
+    for index in make_indices():
+        index.build(positions)
+        for radius in (0.0, 10, 55, 130, 400):
+            check_radius_batch(index, positions, points, radius)
+
+
+def test_insert_after_build_keeps_items_and_indices():
+    rng = np.random.default_rng(1)
+    positions = rng.uniform((0, 0), (WORLD_WIDTH, WORLD_HEIGHT), (50, 2))
+    extra = rng.uniform((0, 0), (WORLD_WIDTH, WORLD_HEIGHT), (20, 2))
+    everything = np.vstack([positions, extra])
+    names = [f'item {i}' for i in range(len(everything))]
+    query = Rect(WORLD_WIDTH/2, WORLD_HEIGHT/2, 900, 600)
+    inside = (np.abs(everything[:, 0] - query.x) <= query.w) & (np.abs(everything[:, 1] - query.y) <= query.h)
+
+    for index in make_indices():
+        index.build(positions, names[:len(positions)])
+        for i, p in enumerate(extra):
+            assert index.insert(pygame.math.Vector2(p[0], p[1]), names[len(positions) + i])
+
+        found = []
+        index.query(query, found)
+        assert sorted(found) == sorted(n for n, keep in zip(names, inside) if keep)
+        assert index.query_indices(query).tolist() == np.flatnonzero(inside).tolist()
+        check_radius_batch(index, everything, everything[::7], 200)
@@ -0,0 +1,34 @@
+from collections import OrderedDict
+
+from constants import TEXT_CACHE_SIZE
+
+
+class TextCache(object):
+    '''
+        LRU cache of rendered text surfaces keyed by (font, text, antialias, color).
+        Legends and stats mostly repeat the same strings every frame, only new strings are rendered.
+    '''
+    def __init__(self, cache_size=TEXT_CACHE_SIZE):
+        """
+        Args:
+            cache_size: number of text surfaces kept
+        """
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def render(self, font, text, antialias, color):
+        '''
+            Same as font.render(text, antialias, color), from the cache when it was rendered before
+
+            return: Surface shared by every caller, copy it before drawing on it
+        '''
+        key = (font, text, antialias, tuple(color))
+        surface = self.cache.get(key)
+        if surface is not None:
+            self.cache.move_to_end(key)
+            return surface
+
+        surface = self.cache[key] = font.render(text, antialias, color)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return surface
@@ -4,6 +4,7 @@ from math import atan2, pi, exp, floor
 import random
 import copy 
 import numpy as np
+from sprite_cache import SpriteAtlas
 vec = pg.math.Vector2 
 
 def normalFunction(omega,center,position):
@@ -68,8 +69,8 @@ def limit(v2, max):
         :return v: returns vector 
         :rtype v: vector2
     """
-    v = copy.deepcopy(v2)
-    if v.length() > max:
+    v = vec(v2)
+    if v.length_squared() > max*max:
         v.scale_to_length(max)
     return v
 
@@ -147,11 +148,9 @@ class Aircraft(pg.sprite.Sprite):
     """
     def __init__(self):
         pg.sprite.Sprite.__init__(self)
-        self.sprites = []
-
-        for i in range(0,4):
-            self.sprites.append(pg.image.load(f'models/Drone5/sprite_{i}.png').convert_alpha())
-            
+        # frames rotated at SPRITE_ROTATION_STEPS angles, shared by every drone
+        self.atlas = SpriteAtlas.load([f'models/Drone5/sprite_{i}.png' for i in range(0,4)], .12)
+        self.sprites = self.atlas.frames
 
         self.atual = 0
         # inherited from the pygame sprite class it is the first element of the drone
@@ -190,11 +189,8 @@ class Aircraft(pg.sprite.Sprite):
         if self.atual >= len(self.sprites):
             self.atual = 0
 
-        self.image = self.sprites[floor(self.atual)]
-    
-        # Rotates image -> angle should be in degrees
-        # rotozoom(Surface, angle, scale) -> Surface
-        self.image = pg.transform.rotozoom(self.image, -angle*180/pi - 90, .12)
+        # Rotated image from the atlas -> angle should be in degrees
+        self.image = self.atlas.get(floor(self.atual), -angle*180/pi - 90)
         self.rect = self.image.get_rect()
         # positions center of rect in acual drone position
         self.rect.center = position.x,position.y
@@ -224,11 +220,9 @@ class Npc_target(pg.sprite.Sprite):
     """
     def __init__(self):
         pg.sprite.Sprite.__init__(self)
-        self.sprites = []
-
-        #for i in range(1,4):
-        self.sprites.append(pg.image.load(f'models/texture/wandering_trader1.png').convert_alpha())
-        self.sprites[-1] =  pg.transform.rotozoom(self.sprites[-1], 0, 1)
+        # the npc is never rotated, only the frames are kept
+        self.atlas = SpriteAtlas.load(['models/texture/wandering_trader1.png'], 1, rotation_steps=1)
+        self.sprites = self.atlas.frames
 
         self.atual = 0
         # inherited from the pygame sprite class it is the first element of the drone
@@ -267,11 +261,9 @@ class Tree(pg.sprite.Sprite):
     """
     def __init__(self):
         pg.sprite.Sprite.__init__(self)
-        self.sprites = []
-
-        for i in range(1,2):
-            self.sprites.append(pg.image.load(f'models/tree3/tree_{i}.png').convert_alpha())
-            self.sprites[i-1] =  pg.transform.rotozoom(self.sprites[i-1], 0, .3)
+        # the tree is never rotated, only the frames are kept
+        self.atlas = SpriteAtlas.load([f'models/tree3/tree_{i}.png' for i in range(1,2)], .3, rotation_steps=1)
+        self.sprites = self.atlas.frames
 
         self.atual = 0
         # inherited from the pygame sprite class it is the first element of the drone
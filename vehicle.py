@@ -1,46 +1,49 @@
 import pygame as pg
-from utils import Aircraft, random_color, limit, constrain, bivariateFunction, derivativeBivariate, normalFunction
+from utils import Aircraft, random_color, limit, bivariateFunction, derivativeBivariate, normalFunction
 from constants import *
 from math import cos, sin, atan2, pi, inf
 import random
-import copy 
 import numpy as np
 from typing import List, Optional, Tuple, Union
 from quadtree import Quadtree, Rect
+from swarm_state import SwarmState
 
 
 vec2 = pg.math.Vector2
 
 class Vehicle(object):
 
-    def __init__(self, x,y, behavior, window):
+    def __init__(self, x,y, behavior, window=None, swarm_state=None):
         """
             idealized vehicle representing a drone
 
             :param x and y: represents inicial target 
             :param behavior: State Machine 
-            :param window: pygame screen were it will be draw
+            :param window: pygame screen were it will be draw, None when running headless
+            :param swarm_state: SwarmState storing the physical state of the swarm,
+                                a private one is created when not given
         """
 
         self.debug = False #  debug lines is Off
 
-        # Variables used to move drone 
-        self.location = vec2(x,y) # Random position in screen
-        self.velocity = vec2(0.1,0) # Inicial speed
+        # Variables used to move drone: position, velocity, acceleration and rotation
+        # are a view of one row of the swarm state arrays
+        if swarm_state is None:
+            swarm_state = SwarmState(capacity=1)
+        self.swarm_state = swarm_state
+        # Random position in screen, inicial speed and inicital rotation
+        self.state_index = swarm_state.add(x, y, 0.1, 0, atan2(y, x), FORWARD_SPEED)
         self.mission_target = vec2(x,y)
         self.target = vec2(x,y)
-        self.acceleration = vec2(0,0)
         self.radius = SIZE_DRONE # Drone Size
         self.desired = vec2()
+        self.seek_target = None # last target seeked, drawn as a point
         # closest drone
         self.closest_drone = None
         self.index_closest_drone = None
 
-        self.memory_location = [] # To draw track
-        self.rotation = atan2(self.location.y, self.location.x) # inicital rotation
 
         # Arbitrary values
-        self.max_speed = FORWARD_SPEED
         self.max_force = SEEK_FORCE
         self.angular_speed = ANGULAR_SPEED
 
@@ -53,62 +56,113 @@ class Vehicle(object):
         self.theta = 0 # variavel para o eight somada no seek_around
         self.count = 0
 
-        # Variables to draw drone using Sprites
-        self.drone = Aircraft() 
-        self.all_sprites = pg.sprite.Group()
-        self.all_sprites.add(self.drone)
+        # Variables to draw drone using Sprites, loaded on first draw
+        self.drone = None
+        self.all_sprites = None
 
         # variables to search in grid
         self.position_in_grid = (0,0)
         self.grid_map = None
+        self.path_planner = None # PathPlanner of the grid, used when the drone is blocked
         self.found = False
 
+    @property
+    def location(self):
+        p = self.swarm_state.position[self.state_index]
+        return vec2(p[0], p[1])
+
+    @location.setter
+    def location(self, value):
+        self.swarm_state.position[self.state_index] = (value[0], value[1])
+
+    @property
+    def velocity(self):
+        v = self.swarm_state.velocity[self.state_index]
+        return vec2(v[0], v[1])
+
+    @velocity.setter
+    def velocity(self, value):
+        self.swarm_state.velocity[self.state_index] = (value[0], value[1])
+
+    @property
+    def acceleration(self):
+        a = self.swarm_state.acceleration[self.state_index]
+        return vec2(a[0], a[1])
+
+    @acceleration.setter
+    def acceleration(self, value):
+        self.swarm_state.acceleration[self.state_index] = (value[0], value[1])
+
+    @property
+    def target(self):
+        t = self.swarm_state.target[self.state_index]
+        if np.isnan(t[0]):
+            return None
+        return vec2(t[0], t[1])
+
+    @target.setter
+    def target(self, value):
+        if value is None:
+            self.swarm_state.target[self.state_index] = np.nan
+        else:
+            self.swarm_state.target[self.state_index] = (value[0], value[1])
+
+    @property
+    def rotation(self):
+        return self.swarm_state.rotation[self.state_index]
+
+    @rotation.setter
+    def rotation(self, value):
+        self.swarm_state.rotation[self.state_index] = value
+
+    @property
+    def max_speed(self):
+        return self.swarm_state.max_speed[self.state_index]
+
+    @max_speed.setter
+    def max_speed(self, value):
+        self.swarm_state.max_speed[self.state_index] = value
+
     def reached_goal(self, target):
         return target and (target - self.location).length() <= RADIUS_TARGET 
     
     def applyForce(self, force):
-        self.acceleration += force/MASS # Newton's second law
-        #f = limit(force , self.max_force)
-        #self.acceleration += force/MASS
+        # Newton's second law
+        a = self.swarm_state.acceleration[self.state_index]
+        a[0] += force[0]/MASS
+        a[1] += force[1]/MASS
 
     def update(self):
+        """
+        Updates only this drone. SwarmManager updates the whole swarm at once
+        using update_behavior(), SwarmState.step() and update_track().
+        """
         # adds drag force
         self.apply_drag()
+        # updates behavior in machine state
+        self.update_behavior()
+        # Updates velocity, limits it to max_speed, updates position and constrains it to the world
+        self.swarm_state.integrate(self.state_index)
+        self.update_track()
+
+    def update_behavior(self):
         # updates behavior in machine state
         self.behavior.update(self)
-        # Updates velocity at every step and limits it to max_speed
-        self.velocity += self.acceleration * 1
-        self.velocity = limit(self.velocity, self.max_speed)
-        # updates position
-        self.location += self.velocity
-        # Prevents it from crazy spinning due to very low noise speeds
-        if self.velocity.length() > 0.8:
-            self.rotation = atan2(self.velocity.y,self.velocity.x)
-        # Constrains position to limits of screen
-        self.location = constrain(self.location,WORLD_WIDTH,WORLD_HEIGHT)
-        self.acceleration *= 0
-
-        # Memory of positions to draw Track
-        self.memory_location.append((self.location.x,self.location.y))
-        # size of track
-        if len(self.memory_location) > SIZE_TRACK:
-            self.memory_location.pop(0)
+
+    def update_track(self):
+        # Memory of positions, kept in the ring buffer of the swarm state
+        self.swarm_state.record_track(self.state_index)
+
+    @property
+    def track(self):
+        """Last positions of the drone in the mission, up to the track length of the swarm state, array (n, 2)"""
+        return self.swarm_state.get_track(self.state_index)
 
     def apply_drag(self):
         """
         Applies aerodynamic drag force to the drone.
         """
-        drag_coefficient = 0.5  # Adjust this value
-        area = 0.1  # Approximate frontal area (adjust this)
-        air_density = 1.225  # kg/m^3 (sea level)
-
-        speed_squared = self.velocity.length_squared() # Avoid square root
-
-        drag_magnitude = 0.5 * air_density * area * drag_coefficient * speed_squared
-        drag_direction = -self.velocity.normalize()
-
-        drag_force = drag_direction * drag_magnitude
-        self.applyForce(drag_force)
+        self.swarm_state.apply_drag(self.state_index)
 
     def seek(self, target):
         """
@@ -125,8 +179,8 @@ class Vehicle(object):
         steer = limit(steer,self.max_force)
         # Applies steering force to drone
         self.applyForce(steer)
-        # Draws current target being seeked 
-        pg.draw.circle(self.window, self.color_target ,target ,5, 0)
+        # Current target being seeked, drawn later
+        self.seek_target = target
     
     def arrive_new(self, target):
         """
@@ -143,8 +197,8 @@ class Vehicle(object):
         
         accelerate = limit(error, self.max_force)
         self.applyForce(accelerate)
-        # Draws current target as a point 
-        pg.draw.circle(self.window, self.color_target ,target ,5, 0)
+        # Current target, drawn later as a point 
+        self.seek_target = target
 
     def arrive_pv(self, target):
         """
@@ -163,8 +217,8 @@ class Vehicle(object):
         a_desired =  limit(self.desired, self.max_force)
 
         self.applyForce(a_desired)
-        # Draws current target as a point 
-        pg.draw.circle(self.window, self.color_target ,target ,5, 0)
+        # Current target, drawn later as a point 
+        self.seek_target = target
 
     def arrive(self, target):
         """
@@ -176,9 +230,9 @@ class Vehicle(object):
         d = self.desired.magnitude() 
 
         try:
-            dist = copy.deepcopy(self.desired.normalize()) # obtem direção
+            dist = self.desired.normalize() # obtem direção
         except: # If the magnitude of desired is zero it cant be normalized
-            dist = copy.deepcopy(self.desired)
+            dist = vec2(self.desired)
         
         r = RADIUS_TARGET
         # Modulates the force
@@ -197,8 +251,8 @@ class Vehicle(object):
         # Simulates Wind - random Noise
         wind = vec2(random.uniform(-0.15,0.15) , random.uniform(-0.15,0.15)  )
         self.applyForce(wind)
-        # Draws current target as a point 
-        pg.draw.circle(self.window, self.color_target ,target ,5, 0)
+        # Current target, drawn later as a point 
+        self.seek_target = target
 
     def stay_at(self, center, r = RADIUS_TARGET):
         """
@@ -206,7 +260,7 @@ class Vehicle(object):
         """
         posToCenter = center - self.location 
         #ok
-        if self.debug == True:
+        if self._debug_draw():
             pg.draw.line(self.window,BLACK, self.location ,center,1)
 
         # se o veiculo se encontra mais longue q o raio de rotaçao
@@ -217,7 +271,8 @@ class Vehicle(object):
             # reinicia forças
             centerToPerimeter = posToCenter.normalize()*(-1*r )
             #ok
-            pg.draw.line(self.window,(0,0,255),center,center+centerToPerimeter,5 )
+            if self._debug_draw():
+                pg.draw.line(self.window,(0,0,255),center,center+centerToPerimeter,5 )
             
             posToPerimeter = centerToPerimeter + posToCenter 
             #pg.draw.line(window,(255,0,0),center,center+posToPerimeter,5 )
@@ -235,7 +290,7 @@ class Vehicle(object):
             new_target.y += r  * sin(theta)
             new_target += center
 
-            if self.debug == True:
+            if self._debug_draw():
                 pg.draw.line(self.window,(0,255,0), center,  new_target ,5)# verde é o target
                 pg.draw.line(self.window,BLACK, self.location, new_target, 2 )
             
@@ -256,12 +311,12 @@ class Vehicle(object):
         fut_pos = self.velocity.normalize()*(hop_ahead)
         fut_pos += self.location
 
-        if self.debug == True:
+        if self._debug_draw():
             pg.draw.line(self.window,(0,255,50),self.location,fut_pos,5)
         #print(f'center: {center}')
         posToCenter = center - fut_pos
         # line from drone to center
-        if self.debug == True:
+        if self._debug_draw():
             pg.draw.line(self.window,BLACK, self.location ,center,1)
 
         # se o veiculo se encontra mais longue q o raio de rotaçao
@@ -272,7 +327,7 @@ class Vehicle(object):
             # reinicia forças
             centerToPerimeter = posToCenter.normalize()*(-1*radius_target)
             #ok
-            if self.debug == True:
+            if self._debug_draw():
                 pg.draw.line(self.window,(0,0,255),center,center+centerToPerimeter,5 )
             
             posToPerimeter = centerToPerimeter + posToCenter 
@@ -290,7 +345,7 @@ class Vehicle(object):
             new_target.x += radius_target * cos(self.theta)
             new_target.y += radius_target * sin(self.theta)
             new_target += center
-            if self.debug == True:
+            if self._debug_draw():
                 pg.draw.line(self.window,(0,255,0), center,  new_target ,5)# verde é o target
                 pg.draw.line(self.window,BLACK, self.location, new_target, 2 )
             self.seek(new_target)
@@ -322,20 +377,30 @@ class Vehicle(object):
     def get_debug(self):
         return str(self.debug)
 
-    def align_direction_with_swarm(self, quadtree: Quadtree, index):
+    def _debug_draw(self):
+        """
+        Debug lines are only drawn when a window is available (not headless).
+        """
+        return self.debug and self.window is not None
+
+    def align_direction_with_swarm(self, quadtree: Quadtree, index, neighbors=None):
         """
          This method avoids collisions with other drones
-         During simulation it receives the quadtree containing all drones 
+         During simulation it receives the neighbor index (Quadtree or SpatialHash) containing all drones 
          index: is the current id of drone being checked 
+         neighbors: drones close to this one, already found by a batched query. 
+                    The index is queried when not given
         """
         # Define search range
         separation_factor = 2.2
         search_radius = AVOID_DISTANCE * separation_factor
-        range_rect = Rect(self.location.x, self.location.y, search_radius, search_radius)
         
-        # Query quadtree for nearby drones
-        nearby_drones = []
-        quadtree.query(range_rect, nearby_drones)
+        if neighbors is None:
+            # Query index for nearby drones
+            neighbors = []
+            range_rect = Rect(self.location.x, self.location.y, search_radius, search_radius)
+            quadtree.query(range_rect, neighbors)
+        nearby_drones = neighbors
 
         soma = vec2(0,0) # sums up all directions of close drones
         count = 0 # counts the number of drones that are close
@@ -364,42 +429,69 @@ class Vehicle(object):
             #----
             self.applyForce(steer)
                   
-    def draw(self, window):
+    def draw(self, window, view=None):
 
         """
         Render drone with optional debug visualization.
         
         Args:
             window: Pygame window surface
+            view: DisplayManager to draw on the screen at its zoom and offset,
+                  None draws in world coordinates. Sprites keep their size in both cases
+
+        Returns:
+            list of rects drawn, used to restore the background on the next frame
         """
+        # Sprites are only loaded when the drone is drawn for the first time
+        if self.all_sprites is None:
+            self.drone = Aircraft()
+            self.all_sprites = pg.sprite.Group()
+            self.all_sprites.add(self.drone)
+
+        if view is None:
+            to_view = vec2
+        else:
+            to_view = lambda p: view.world_to_screen(vec2(p[0], p[1]))
+        location = to_view(self.location)
+
+        rects = []
+        # Draw current target being seeked as a point
+        if self.seek_target is not None:
+            rects.append(pg.draw.circle(window, self.color_target, to_view(self.seek_target), 5, 0))
+
         # Draw connection to closest drone
         if self.closest_drone:
-            pg.draw.line(self.window, self.color_target, self.location, self.closest_drone, 1)
-
-        # Render drone track
-        if len(self.memory_location) >= 2:
-            pg.draw.lines(self.window, self.color_target, False, self.memory_location, 1)
+            rects.append(pg.draw.line(window, self.color_target, location, to_view(self.closest_drone), 1))
 
         # Debug visualization
         if self.debug:
-            pg.draw.circle(self.window, (100, 100, 100), self.location, AVOID_DISTANCE, 1)
+            radius = AVOID_DISTANCE if view is None else view.scale_length(AVOID_DISTANCE)
+            rects.append(pg.draw.circle(window, (100, 100, 100), location, radius, 1))
             v = self.velocity.length()
-            pg.draw.line(self.window, self.color_target, self.location, 
-                         self.location + self.velocity.normalize() * v * 20, 1)
+            rects.append(pg.draw.line(window, self.color_target, location, 
+                         location + self.velocity.normalize() * v * 20, 1))
 
         # Render sprite
-        self.all_sprites.draw(self.window)
-        self.all_sprites.update(self.location, self.rotation)
+        self.all_sprites.update(location, self.rotation)
+        self.all_sprites.draw(window)
+        rects.append(self.drone.rect.copy())
+        return rects
 
 
-    def collision_avoidance(self, quadtree: Quadtree, pos_obstacles: List[vec2], index: int) -> None:
+    def collision_avoidance(self, quadtree: Quadtree, pos_obstacles: List[vec2], index: int,
+                            neighbors: Optional[List['Vehicle']] = None,
+                            obstacle_force: Optional[vec2] = None) -> None:
         """
         Advanced collision avoidance with drones and obstacles.
         
         Args:
-            quadtree (Quadtree): Quadtree containing all drones
+            quadtree (Quadtree): neighbor index (Quadtree or SpatialHash) containing all drones
             pos_obstacles (List[vec2]): Obstacle positions
             index (int): Current drone's index
+            neighbors (List[Vehicle]): drones close to this one, already found by a batched query.
+                                       The index is queried when not given
+            obstacle_force (vec2): repulsion of obstacles sampled from a RepulsionField.
+                                   It is evaluated for every obstacle when not given
         """
         # Drone collision avoidance
         closest = +inf
@@ -407,10 +499,12 @@ class Vehicle(object):
         factor_distance = 2
         search_radius = AVOID_DISTANCE * factor_distance
         
-        # Query quadtree for nearby drones
-        range_rect = Rect(self.location.x, self.location.y, search_radius, search_radius)
-        nearby_drones = []
-        quadtree.query(range_rect, nearby_drones)
+        if neighbors is None:
+            # Query index for nearby drones
+            neighbors = []
+            range_rect = Rect(self.location.x, self.location.y, search_radius, search_radius)
+            quadtree.query(range_rect, neighbors)
+        nearby_drones = neighbors
 
         for p in nearby_drones:
             if p == self:
@@ -421,7 +515,7 @@ class Vehicle(object):
             # Find closest drone
             if 0 < d < closest:
                 closest = d
-                self.closest_drone = copy.deepcopy(p.location)
+                self.closest_drone = p.location
             
             # Collision prevention
             if d < search_radius:
@@ -431,9 +525,17 @@ class Vehicle(object):
                 break
 
         # Obstacle collision avoidance
-        factor_repulsion = 0.005
+        factor_repulsion = OBSTACLE_REPULSION
         dist_avoid = AVOID_OBSTACLES + AVOID_DISTANCE
 
+        if obstacle_force is not None:
+            # precomputed repulsion, only the emergency handling is left
+            self.applyForce(obstacle_force)
+            for obstacle in pos_obstacles:
+                if (self.location - obstacle).length() < RADIUS_OBSTACLES + SIZE_DRONE:
+                    self.velocity *= -0.5
+            return
+
         for obstacle in pos_obstacles:
             d = (self.location - obstacle).length()
             
@@ -459,6 +561,9 @@ class Vehicle(object):
     def save_grid(self, grid):
         self.grid_map = grid
 
+    def save_path_planner(self, path_planner):
+        self.path_planner = path_planner
+
     # Deleting (Calling destructor)
     #def __del__(self):
         #print('Drone Deleted')